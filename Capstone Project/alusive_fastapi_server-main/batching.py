@@ -0,0 +1,138 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import Histogram, collector
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+# Time a request waits to be batched, in seconds: sub-millisecond up to a slow forward pass
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class _Request:
+    __slots__ = ("items", "future", "enqueued_at")
+
+    def __init__(self, items):
+        self.items = items
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching scheduler.
+
+    ``batch_fn`` runs on a single scheduler thread, one batch at a time. While it is
+    idle, a submission runs at once, together with whatever else is already queued,
+    so a lone caller never waits. Items submitted while a batch is running are
+    coalesced: they are collected until ``max_batch_size`` items are pending or the
+    oldest has waited ``max_wait_ms``. Each caller gets back the results for its
+    own items.
+
+    ``batch_fn`` takes a list of items and returns a sequence of results of the same length.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name="batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait = Histogram(BATCH_WAIT_BUCKETS)
+        self.batch_latency = Histogram()
+        collector.attach_histogram("batch_size", self.batch_sizes, "Items per batch.", batcher=name)
+        collector.attach_histogram("batch_queue_wait_seconds", self.queue_wait, "Time items wait to be batched.", batcher=name)
+        collector.attach_histogram("batch_latency_seconds", self.batch_latency, "Time to run one batch.", batcher=name)
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork, since threads do not survive fork()
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, items):
+        """Queues items for the next batch; returns a future for the list of their results."""
+        items = list(items)
+        request = _Request(items)
+        if not items:
+            request.future.set_result([])
+            return request.future
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, items):
+        """Blocking ``submit``."""
+        return self.submit(items).result()
+
+    def _run(self):
+        pending_queue = self._queue
+        carry = None
+        idle_since = time.monotonic()
+        while True:
+            first = carry or pending_queue.get()
+            carry = None
+            batch, size = [first], len(first.items)
+            # Arrived while idle: nothing to wait for. Arrived during a batch: coalesce.
+            deadline = first.enqueued_at + self.max_wait if first.enqueued_at < idle_since else 0.0
+
+            while size < self.max_batch_size:
+                # Past the deadline, still take whatever is already queued
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        request = pending_queue.get(timeout=timeout)
+                    else:
+                        request = pending_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if size + len(request.items) > self.max_batch_size:
+                    carry = request  # Starts the next batch instead of overflowing this one
+                    break
+                batch.append(request)
+                size += len(request.items)
+
+            self._execute(batch, size)
+            idle_since = time.monotonic()
+
+    def _execute(self, batch, size):
+        started_at = time.monotonic()
+        for request in batch:
+            self.queue_wait.observe(started_at - request.enqueued_at)
+        self.batch_sizes.observe(size)
+
+        try:
+            results = list(self.batch_fn([item for request in batch for item in request.items]))
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            self.batch_latency.observe(time.monotonic() - started_at)
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(results[offset:offset + len(request.items)])
+            offset += len(request.items)
+
+    def stats(self):
+        """Returns the configuration plus batch size, wait time and batch latency histograms."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "batch_latency_seconds": self.batch_latency.snapshot(),
+        }
@@ -0,0 +1,96 @@
+"""
+Benchmarks chatbot encoder backends: single-question encode latency and memory.
+
+Each backend runs in its own subprocess so its RSS is measured in isolation.
+Reports load time, p50/p99 latency of encoding one question (the /chat/ hot path),
+and resident memory after loading and at peak.
+
+Usage (from the server directory):
+    python benchmarks/bench_encoders.py --backends torch torch-int8 onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from harness import SERVER_DIR, current_rss_mb, peak_rss_mb
+
+sys.path.insert(0, SERVER_DIR)
+
+
+def run_backend(backend, model_name, faqs_path, iterations, warmup):
+    """Measures one backend in this process; returns the result as a dict."""
+    from encoders import load_encoder
+    from faq_index import load_faq_entries
+
+    questions = [entry["question"] for entry in load_faq_entries(faqs_path)]
+    baseline_rss = current_rss_mb()
+
+    start = time.perf_counter()
+    model = load_encoder(model_name, backend)
+    load_seconds = time.perf_counter() - start
+    loaded_rss = current_rss_mb()
+
+    for i in range(warmup):
+        model.encode(questions[i % len(questions)], normalize_embeddings=True)
+
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        model.encode(questions[i % len(questions)], normalize_embeddings=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(np.mean(latencies)),
+        "model_rss_mb": loaded_rss - baseline_rss,
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--faqs", default=os.path.join(SERVER_DIR, "data", "faqs.json"))
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx", "onnx-int8"])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)  # Internal: measure one backend in-process
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.model, args.faqs, args.iterations, args.warmup)))
+        return
+
+    results = []
+    print(f"{'backend':<12} {'load s':>7} {'p50 ms':>8} {'p99 ms':>8} {'model MB':>9} {'peak MB':>8}")
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", backend, "--model", args.model,
+             "--faqs", args.faqs, "--iterations", str(args.iterations), "--warmup", str(args.warmup)],
+            capture_output=True, text=True,
+        )
+        if output.returncode != 0:
+            print(f"{backend:<12} failed: {output.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{backend:<12} {result['load_seconds']:>7.2f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['model_rss_mb']:>9.0f} {result['peak_rss_mb']:>8.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "iterations": args.iterations, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Load-tests /chat/, /predict-grant/ and /validate/ in-process through the ASGI app.
+
+Requests go through httpx's ASGI transport, so the whole FastAPI stack runs (validation,
+middleware, pools, batching) without a network or a separate server. Each endpoint
+runs in its own subprocess, so its peak RSS only includes the models it loads. Emails
+go to the fake transport, documents are synthetic PDFs and scans (see synthetic.py), and
+the result caches are off unless --cache is given.
+
+For every endpoint and concurrency level the report shows throughput, p50/p95/p99
+latency and resident memory. The load generator shares the event loop with the app,
+so absolute numbers are a baseline to compare commits against, not a capacity figure.
+
+Usage (from the server directory):
+    python benchmarks/bench_endpoints.py --concurrency 1 8 32 --requests 200 --json bench.json
+    python benchmarks/bench_endpoints.py --endpoints chat --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from harness import SERVER_DIR, compare, configure_server, current_rss_mb, latency_summary, peak_rss_mb, write_results
+from synthetic import chat_questions, synthetic_applicant, synthetic_image, synthetic_pdf
+
+ENDPOINTS = ("chat", "predict-grant", "validate")
+
+
+def request_builder(endpoint, seed):
+    """Returns a function mapping a request number to ``client.post`` arguments."""
+    if endpoint == "chat":
+        questions = chat_questions()
+        return lambda i: {"url": "/chat/", "json": {"question": questions[i % len(questions)]}}
+
+    if endpoint == "predict-grant":
+        rng = random.Random(seed)
+        applicants = [synthetic_applicant(rng) for _ in range(256)]
+        return lambda i: {"url": "/predict-grant/", "json": applicants[i % len(applicants)]}
+
+    if endpoint == "validate":
+        documents = [
+            ("signed.pdf", synthetic_pdf(pages=3, signed=True, seed=seed)),
+            ("unsigned.pdf", synthetic_pdf(pages=3, signed=False, seed=seed + 1)),
+            ("signed.png", synthetic_image(signed=True, seed=seed + 2)),
+            ("unsigned.png", synthetic_image(signed=False, seed=seed + 3)),
+        ]
+
+        def build(i):
+            filename, content = documents[i % len(documents)]
+            return {
+                "url": "/validate/",
+                "files": {"document": (filename, content)},
+                "data": {"full_name": "Bench Mark", "email": f"bench+{i}@example.com", "document_type": "grant"},
+            }
+        return build
+
+    raise ValueError(f"Unknown endpoint '{endpoint}'. Must be one of {', '.join(ENDPOINTS)}.")
+
+
+async def run_level(client, build, concurrency, total):
+    """Sends ``total`` requests from ``concurrency`` concurrent clients; returns the measurements."""
+    numbers = iter(range(total))
+    latencies = []
+    statuses = Counter()
+
+    async def client_loop():
+        for i in numbers:  # Shared iterator: each request number is sent once
+            start = time.perf_counter()
+            response = await client.post(**build(i))
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": total / elapsed,
+        **latency_summary(latencies),
+    }
+
+
+async def run_endpoint(endpoint, concurrency_levels, total, warmup, seed, use_caches):
+    """Benchmarks one endpoint in this process; returns one result per concurrency level."""
+    configure_server(use_caches)
+    import httpx
+    import main
+
+    build = request_builder(endpoint, seed)
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # Loads the models and fills the pools before anything is timed
+            start = time.perf_counter()
+            for i in range(warmup):
+                response = await client.post(**build(i))
+                if response.status_code >= 400:
+                    raise RuntimeError(f"Warm-up request failed with {response.status_code}: {response.text[:300]}")
+            warmup_seconds = time.perf_counter() - start
+
+            for concurrency in concurrency_levels:
+                result = await run_level(client, build, concurrency, total)
+                results.append({
+                    "endpoint": endpoint,
+                    "warmup_seconds": warmup_seconds,
+                    **result,
+                    "rss_mb": current_rss_mb(),
+                    "peak_rss_mb": peak_rss_mb(),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Keep the validation and chat result caches on.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--compare", help="Print the change against a previous --json file.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)  # Internal: benchmark one endpoint in-process
+    args = parser.parse_args()
+
+    if args.worker:
+        results = asyncio.run(
+            run_endpoint(args.worker, args.concurrency, args.requests, args.warmup, args.seed, args.cache)
+        )
+        print(json.dumps(results))
+        return
+
+    results = []
+    print(f"{'endpoint':<14} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'peak MB':>8}")
+    for endpoint in args.endpoints:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", endpoint,
+                   "--concurrency", *map(str, args.concurrency), "--requests", str(args.requests),
+                   "--warmup", str(args.warmup), "--seed", str(args.seed)]
+        if args.cache:
+            command.append("--cache")
+        output = subprocess.run(command, capture_output=True, text=True, cwd=SERVER_DIR)
+        if output.returncode != 0:
+            error = (output.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"{endpoint:<14} failed: {error}")
+            results.append({"endpoint": endpoint, "error": error})
+            continue
+        for result in json.loads(output.stdout.strip().splitlines()[-1]):
+            results.append(result)
+            print(f"{endpoint:<14} {result['concurrency']:>5} {result['throughput_rps']:>8.1f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7} {result['peak_rss_mb']:>8.0f}")
+
+    if args.json:
+        settings = {key: getattr(args, key) for key in ("endpoints", "concurrency", "requests", "warmup", "seed", "cache")}
+        write_results(args.json, "endpoints", settings, results)
+    if args.compare:
+        compare(args.compare, results, ("endpoint", "concurrency"), ("throughput_rps", "p50_ms", "p99_ms"))
+
+
+if __name__ == "__main__":
+    main()
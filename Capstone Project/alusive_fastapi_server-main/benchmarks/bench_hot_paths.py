@@ -0,0 +1,102 @@
+"""
+Micro-benchmarks of the functions on each endpoint's hot path.
+
+Times ``preprocess_input`` and the precompiled ``feature_encoder`` (one applicant),
+``predict_grant_category`` (with the GRANT_SCORER from the environment),
+``build_feature_matrix`` (a cohort), ``preprocess_image`` (a scanned page),
+``get_answer`` (one chatbot question, caches off) and
+``DocumentValidator.validate_document`` (a 3-page PDF and a scan) in isolation, and reports p50/p95/p99 latency and calls per second for each. A
+benchmark that cannot run here (e.g. a model file is missing) is reported with
+its error and the rest still run.
+
+Usage (from the server directory):
+    python benchmarks/bench_hot_paths.py --json hot_paths.json
+    python benchmarks/bench_hot_paths.py --only preprocess_input get_answer --compare hot_paths.json
+"""
+import argparse
+import random
+import time
+
+from harness import compare, configure_server, latency_summary, peak_rss_mb, write_results
+from synthetic import chat_questions, synthetic_applicant, synthetic_image, synthetic_pdf
+
+
+def hot_paths(seed, cohort_size):
+    """Returns ``{name: zero-argument callable}``; inputs vary between calls where it matters."""
+    configure_server()
+    import main
+    import utils
+    from registry import models
+
+    rng = random.Random(seed)
+    applicants = [main.applicant_to_dict(main.ApplicantData(**synthetic_applicant(rng))) for _ in range(max(cohort_size, 256))]
+    questions = chat_questions()
+    scan = synthetic_image(signed=True, seed=seed)
+    pdf = synthetic_pdf(pages=3, signed=True, seed=seed)
+    calls = iter(range(10 ** 12))
+
+    return {
+        "preprocess_input": lambda: utils.preprocess_input(applicants[next(calls) % len(applicants)], main.FEATURE_COLUMNS),
+        "feature_encoder": lambda: utils.feature_encoder(tuple(main.FEATURE_COLUMNS)).encode(
+            applicants[next(calls) % len(applicants)]
+        ),
+        "predict_grant_category": lambda: utils.predict_grant_category(
+            applicants[next(calls) % len(applicants)], main.FEATURE_COLUMNS
+        ),
+        "build_feature_matrix": lambda: utils.build_feature_matrix(applicants[:cohort_size], main.FEATURE_COLUMNS),
+        "preprocess_image": lambda: utils.preprocess_image(scan),
+        "get_answer": lambda: main.get_answer(questions[next(calls) % len(questions)]),
+        "validate_document[pdf]": lambda: models.get("document_validator").validate_document(pdf, "signed.pdf"),
+        "validate_document[scan]": lambda: models.get("document_validator").validate_document(scan, "signed.png"),
+    }
+
+
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):  # The first calls also load the models
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    summary = latency_summary(latencies)
+    return {**summary, "calls_per_second": 1000 / summary["mean_ms"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--cohort-size", type=int, default=1000, help="Applicants per build_feature_matrix call.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--compare", help="Print the change against a previous --json file.")
+    args = parser.parse_args()
+
+    benchmarks = hot_paths(args.seed, args.cohort_size)
+    names = args.only or list(benchmarks)
+
+    results = []
+    print(f"{'benchmark':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/s':>10}")
+    for name in names:
+        try:
+            result = {"name": name, **measure(benchmarks[name], args.iterations, args.warmup), "peak_rss_mb": peak_rss_mb()}
+        except Exception as e:
+            result = {"name": name, "error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<26} failed: {result['error']}")
+        else:
+            print(f"{name:<26} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+                  f"{result['calls_per_second']:>10.1f}")
+        results.append(result)
+    print(f"Peak RSS: {peak_rss_mb():.0f} MB")
+
+    if args.json:
+        settings = {key: getattr(args, key) for key in ("only", "iterations", "warmup", "cohort_size", "seed")}
+        write_results(args.json, "hot_paths", settings, results)
+    if args.compare:
+        compare(args.compare, results, ("name",))
+
+
+if __name__ == "__main__":
+    main()
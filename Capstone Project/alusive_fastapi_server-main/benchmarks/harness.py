@@ -0,0 +1,100 @@
+"""
+Shared helpers for the benchmark scripts: server settings, latency summaries,
+memory readings, result files and comparisons between runs.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def configure_server(use_caches=False):
+    """
+    Sets the server's environment before ``main`` is imported: emails go to the fake
+    transport, state goes to a temporary directory, nothing is warmed up in the
+    background, and unless ``use_caches`` the result caches are off so every request
+    does the full work.
+    """
+    state_dir = tempfile.mkdtemp(prefix="alusive-bench-")
+    os.environ["NOTIFICATION_TRANSPORT"] = "fake"
+    os.environ.setdefault("RESEND_API_KEY", "unused-by-the-fake-transport")
+    os.environ["NOTIFICATION_DB_PATH"] = os.path.join(state_dir, "notifications.sqlite3")
+    os.environ["JOB_DB_PATH"] = os.path.join(state_dir, "jobs.sqlite3")
+    os.environ["WARMUP_MODELS"] = "none"
+    if not use_caches:
+        os.environ["VALIDATION_CACHE_SIZE"] = "0"
+        os.environ["VALIDATION_CACHE_DB_PATH"] = ""
+        os.environ["CHAT_ANSWER_CACHE_SIZE"] = "0"
+    return state_dir
+
+
+def latency_summary(latencies_ms):
+    latencies_ms = np.asarray(latencies_ms, dtype=np.float64)
+    return {
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "max_ms": float(latencies_ms.max()),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, kind, settings, results):
+    """Writes a result file that ``compare`` can read back."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "kind": kind,
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "settings": settings,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def compare(baseline_path, results, key_fields, metrics=("p50_ms", "p99_ms")):
+    """Prints the change of each metric against a previous result file, matching rows on ``key_fields``."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {tuple(row.get(field) for field in key_fields): row for row in baseline["results"]}
+
+    print(f"\nChange against {baseline_path} (commit {baseline.get('commit')}):")
+    for row in results:
+        key = tuple(row.get(field) for field in key_fields)
+        old = previous.get(key)
+        if old is None or "error" in row or "error" in old:
+            continue
+        changes = []
+        for metric in metrics:
+            if old.get(metric):
+                changes.append(f"{metric} {old[metric]:.2f} -> {row[metric]:.2f} ({row[metric] / old[metric] - 1:+.1%})")
+        print(f"  {' '.join(str(part) for part in key):<36} " + ", ".join(changes))
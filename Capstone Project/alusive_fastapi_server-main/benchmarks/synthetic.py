@@ -0,0 +1,86 @@
+"""
+Synthetic, reproducible inputs for the benchmarks: documents, applicants and chat questions.
+
+Documents are A4-shaped pages of grey "text" bars with a signature line on the last
+page; signed documents get a pen scribble on that line. They exercise the same PDF
+rendering and preprocessing work as real uploads, but the model's verdict on them
+is not meaningful.
+"""
+import io
+import os
+import random
+import sys
+
+from PIL import Image, ImageDraw
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from faq_index import load_faq_entries  # noqa: E402
+
+# A4 at 150 DPI
+PAGE_SIZE = (1240, 1754)
+
+
+def document_page(rng, signed=False, last_page=True, size=PAGE_SIZE):
+    """Draws one page; the last page carries the signature line (and a scribble if ``signed``)."""
+    width, height = size
+    page = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(page)
+
+    y = 150
+    while y < height - (450 if last_page else 150):
+        line_width = rng.randint(width // 2, width - 240)
+        draw.rectangle([120, y, 120 + line_width, y + 14], fill=(90, 90, 90))
+        y += rng.choice((34, 34, 34, 70))
+
+    if last_page:
+        line_y = height - 260
+        draw.line([120, line_y, 620, line_y], fill="black", width=3)
+        if signed:
+            points = [(140 + i * 12, line_y - 40 + rng.randint(-35, 25)) for i in range(38)]
+            draw.line(points, fill=(20, 30, 120), width=5, joint="curve")
+    return page
+
+
+def synthetic_pdf(pages=3, signed=True, seed=0):
+    """Returns the bytes of a ``pages``-page PDF."""
+    rng = random.Random(seed)
+    images = [document_page(rng, signed, last_page=i == pages - 1) for i in range(pages)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=150)
+    return buffer.getvalue()
+
+
+def synthetic_image(signed=True, seed=0, image_format="PNG"):
+    """Returns a single scanned page as image bytes."""
+    buffer = io.BytesIO()
+    document_page(random.Random(seed), signed).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def synthetic_applicant(rng):
+    """Returns a random /predict-grant/ request body."""
+    household_size = rng.randint(1, 10)
+    return {
+        "academic_standing": rng.choice(["Yes", "No"]),
+        "disciplinary_standing": rng.choice(["Yes", "No"]),
+        "financial_standing": rng.choice(["Yes", "No"]),
+        "alu_grant_status": rng.choice(["Yes", "No"]),
+        "previous_alusive_grant": rng.choice(["Yes", "No"]),
+        "fee_balance": round(rng.uniform(0, 5000), 2),
+        "total_monthly_income": round(rng.uniform(0, 2000), 2),
+        "students_in_household": rng.randint(1, 4),
+        "household_size": household_size,
+        "household_supporters": rng.randint(0, household_size),
+        "household_dependants": rng.randint(0, household_size),
+        "alu_grant_amount": round(rng.uniform(0, 3000), 2),
+        "grant_requested": round(rng.uniform(100, 1500), 2),
+        "amount_affordable": round(rng.uniform(0, 1000), 2),
+    }
+
+
+def chat_questions(faqs_path=os.path.join(SERVER_DIR, "data", "faqs.json")):
+    """FAQ questions plus lower-cased and reworded variants, so not every question is an exact match."""
+    questions = [entry["question"] for entry in load_faq_entries(faqs_path)]
+    return questions + [q.lower() for q in questions] + [f"Hi, {q.rstrip('?')} please?" for q in questions]
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+# Document model backends:
+# - "keras": the original tf.keras model (models/document_validator.h5)
+# - "tflite": a converted TFLite model, float or int8, run by the lightweight interpreter
+DOCUMENT_BACKENDS = ("keras", "tflite")
+
+# Default model files; the server's paths (with DOCUMENT_TFLITE_PATH applied) are utils.DOCUMENT_MODEL_PATHS
+KERAS_MODEL_PATH = "models/document_validator.h5"
+TFLITE_MODEL_PATH = "models/document_validator.tflite"
+
+
+class KerasBackend:
+    """Runs the Keras model with ``model.predict``."""
+
+    def __init__(self, model_path=KERAS_MODEL_PATH):
+        import tensorflow as tf
+
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        """Returns the signed probability for each image in a (n, 224, 224, 3) batch."""
+        return self.model.predict(batch, verbose=0)[:, 0]
+
+
+def _interpreter_class():
+    """Prefers the standalone TFLite runtimes, so workers need not import all of TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """Runs a ``.tflite`` model, quantizing inputs and dequantizing outputs when they are int8."""
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH, num_threads=None):
+        self.model_path = model_path
+        self.interpreter = _interpreter_class()(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # A TFLite interpreter must not be invoked from several threads at once
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        """Returns the signed probability for each image in a (n, 224, 224, 3) batch."""
+        batch = np.asarray(batch, dtype=np.float32)
+        scale, zero_point = self._input["quantization"]
+        if scale:
+            info = np.iinfo(self._input["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        batch = batch.astype(self._input["dtype"])
+
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"]).astype(np.float32)
+
+        scale, zero_point = self._output["quantization"]
+        if scale:
+            output = (output - zero_point) * scale
+        return output[:, 0]
+
+
+def load_document_backend(backend="keras", model_path=None, num_threads=None):
+    """Loads the document model with the given backend, from its default path unless one is given."""
+    if backend == "keras":
+        return KerasBackend(model_path or KERAS_MODEL_PATH)
+    if backend == "tflite":
+        return TFLiteBackend(model_path or TFLITE_MODEL_PATH, num_threads=num_threads)
+    raise ValueError(f"Unknown document model backend '{backend}'. Must be one of {', '.join(DOCUMENT_BACKENDS)}.")
+
+
+def convert_to_tflite(keras_model_path=KERAS_MODEL_PATH, output_path=TFLITE_MODEL_PATH,
+                      int8=False, calibration_batches=None):
+    """
+    Converts the Keras document model to TFLite and writes it to ``output_path``.
+
+    With ``int8`` the weights and activations are quantized post-training; the
+    activation ranges are calibrated on ``calibration_batches``, an iterable of
+    preprocessed (1, 224, 224, 3) float32 arrays. Inputs and outputs stay float32.
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_model_path)
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        # Go through a SavedModel, which works for both Keras 2 and Keras 3 models
+        if hasattr(model, "export"):
+            model.export(saved_model_dir)
+        else:
+            tf.saved_model.save(model, saved_model_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+
+        if int8:
+            if calibration_batches is None:
+                raise ValueError("int8 conversion needs calibration_batches.")
+            calibration_batches = list(calibration_batches)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = lambda: ([batch.astype(np.float32)] for batch in calibration_batches)
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+        tflite_model = converter.convert()
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    return output_path
@@ -0,0 +1,53 @@
+from decouple import config
+
+# Sentence encoder backends for the chatbot:
+# - "torch": full-precision PyTorch (the original behaviour)
+# - "torch-int8": PyTorch with the Linear layers dynamically quantized to int8
+# - "onnx": exported ONNX model run by onnxruntime
+# - "onnx-int8": dynamically quantized int8 ONNX model run by onnxruntime
+ENCODER_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Quantized ONNX weights to load; the model hub ships avx2/avx512/avx512_vnni/arm64 variants,
+# and export_int8_onnx() writes the same file names for a local copy of the model
+ENCODER_ONNX_INT8_FILE = config("ENCODER_ONNX_INT8_FILE", default="onnx/model_qint8_avx2.onnx")
+
+
+def load_encoder(model_name, backend="torch"):
+    """Loads a SentenceTransformer for CPU inference with the given backend."""
+    # Imported here so workers that never chat do not pay for torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, device="cpu")
+
+    if backend == "torch-int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            model_name,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": ENCODER_ONNX_INT8_FILE},
+        )
+
+    raise ValueError(f"Unknown encoder backend '{backend}'. Must be one of {', '.join(ENCODER_BACKENDS)}.")
+
+
+def export_int8_onnx(model_name, output_dir, quantization="avx2"):
+    """
+    Exports ``model_name`` to ONNX and writes a dynamically quantized int8 copy to
+    ``output_dir/onnx/model_qint8_<quantization>.onnx``, for hosts without hub access.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    model.save(output_dir)
+    export_dynamic_quantized_onnx_model(model, quantization, output_dir)
+    return output_dir
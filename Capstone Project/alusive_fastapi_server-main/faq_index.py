@@ -0,0 +1,181 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cached embedding versions kept per model; older ones are pruned
+KEEP_CACHED_VERSIONS = 3
+
+
+def load_faq_entries(path):
+    """Loads FAQ entries (a JSON list of objects with "question" and "answer") from a data file."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        if not entry.get("question") or not entry.get("answer"):
+            raise ValueError(f"FAQ entries in {path} need a 'question' and an 'answer'.")
+    if not entries:
+        raise ValueError(f"No FAQ entries found in {path}.")
+    return entries
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class FAQIndex:
+    """
+    FAQ entries with their embeddings, cached on disk and searched by similarity.
+
+    Embeddings are stored as a ``.npy`` file keyed by model name and content hash,
+    and memory-mapped read-only so restarts skip re-encoding and workers on one
+    host share the same pages. When the FAQ changes, only added or edited
+    questions are re-encoded; the rest are copied from the previous version.
+
+    Embeddings must be unit length, so the dot product is the cosine similarity.
+    ``backend="hnsw"`` adds an approximate nearest-neighbour index (requires
+    ``hnswlib``) for large knowledge bases; ``"exact"`` searches by matrix multiply.
+    """
+
+    def __init__(self, data_path, cache_dir, model_name, backend="exact", ann_min_entries=1000):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.backend = backend
+        self.ann_min_entries = ann_min_entries
+
+        self.entries = []
+        self.embeddings = None
+        self.content_hash = None
+        self.reencoded = 0
+        self._ann = None
+
+    @property
+    def _model_key(self):
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_name)
+
+    def _paths(self, content_hash):
+        stem = os.path.join(self.cache_dir, f"{self._model_key}-{content_hash[:16]}")
+        return stem + ".npy", stem + ".json", stem + ".hnsw"
+
+    def load(self, encode):
+        """
+        Loads the entries and their embeddings. ``encode`` maps a list of questions to
+        a 2-D array of unit-length embeddings and is only called for uncached questions.
+        """
+        self.entries = load_faq_entries(self.data_path)
+        entry_hashes = [_sha256(entry["question"]) for entry in self.entries]
+        self.content_hash = _sha256(self.model_name + "\n" + "\n".join(entry_hashes))
+        embeddings_path, manifest_path, ann_path = self._paths(self.content_hash)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.reencoded = 0
+        if not os.path.exists(embeddings_path):
+            self._build(encode, entry_hashes, embeddings_path, manifest_path)
+        self.embeddings = np.load(embeddings_path, mmap_mode="r")
+
+        self._ann = None
+        if self.backend == "hnsw" and len(self.entries) >= self.ann_min_entries:
+            self._ann = self._load_ann(ann_path)
+        return self
+
+    def _previous_embeddings(self):
+        """Maps question hash to embedding row for the most recent cached version of this model."""
+        manifests = glob.glob(os.path.join(self.cache_dir, f"{self._model_key}-*.json"))
+        for manifest_path in sorted(manifests, key=os.path.getmtime, reverse=True):
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                embeddings = np.load(manifest_path[:-len(".json")] + ".npy", mmap_mode="r")
+            except (OSError, ValueError):
+                continue
+            if manifest.get("model") == self.model_name:
+                return {entry_hash: embeddings[row] for row, entry_hash in enumerate(manifest["entry_hashes"])}
+        return {}
+
+    def _build(self, encode, entry_hashes, embeddings_path, manifest_path):
+        previous = self._previous_embeddings()
+        missing = [i for i, entry_hash in enumerate(entry_hashes) if entry_hash not in previous]
+
+        encoded = {}
+        if missing:
+            vectors = np.asarray(encode([self.entries[i]["question"] for i in missing]), dtype=np.float32)
+            encoded = dict(zip(missing, vectors))
+        self.reencoded = len(missing)
+        logger.info("FAQ index: re-encoded %d of %d questions", len(missing), len(entry_hashes))
+
+        embeddings = np.stack([
+            encoded[i] if i in encoded else previous[entry_hash]
+            for i, entry_hash in enumerate(entry_hashes)
+        ]).astype(np.float32)
+
+        # Write to a temporary file and rename, so concurrent workers never see a partial file
+        temporary_path = f"{embeddings_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            np.save(f, embeddings)
+        os.replace(temporary_path, embeddings_path)
+        with open(f"{manifest_path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "entry_hashes": entry_hashes, "dim": embeddings.shape[1]}, f)
+        os.replace(f"{manifest_path}.{os.getpid()}.tmp", manifest_path)
+        self._prune()
+
+    def _prune(self):
+        manifests = glob.glob(os.path.join(self.cache_dir, f"{self._model_key}-*.json"))
+        for manifest_path in sorted(manifests, key=os.path.getmtime, reverse=True)[KEEP_CACHED_VERSIONS:]:
+            stem = manifest_path[:-len(".json")]
+            for path in (stem + ".json", stem + ".npy", stem + ".hnsw"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _load_ann(self, ann_path):
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed; FAQ index falls back to exact search.")
+            return None
+
+        index = hnswlib.Index(space="ip", dim=self.embeddings.shape[1])
+        if os.path.exists(ann_path):
+            index.load_index(ann_path, max_elements=len(self.entries))
+        else:
+            index.init_index(max_elements=len(self.entries), ef_construction=200, M=16)
+            index.add_items(np.ascontiguousarray(self.embeddings), np.arange(len(self.entries)))
+            index.save_index(ann_path)
+        index.set_ef(64)
+        return index
+
+    def search(self, query_embeddings, top_k=1):
+        """
+        Finds the ``top_k`` most similar entries for each query embedding.
+        Returns ``(indices, scores)`` arrays of shape ``(n_queries, top_k)``, best first.
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        top_k = max(1, min(top_k, len(self.entries)))
+
+        if self._ann is not None:
+            labels, distances = self._ann.knn_query(queries, k=top_k)
+            return labels.astype(np.int64), 1.0 - distances  # "ip" distance is 1 - dot product
+
+        scores = queries @ self.embeddings.T
+        if top_k == 1:
+            indices = np.argmax(scores, axis=1)[:, None]
+        else:
+            indices = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            order = np.argsort(-np.take_along_axis(scores, indices, axis=1), axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        return indices, np.take_along_axis(scores, indices, axis=1)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "model": self.model_name,
+            "content_hash": self.content_hash,
+            "backend": "hnsw" if self._ann is not None else "exact",
+            "reencoded_on_load": self.reencoded,
+        }
@@ -0,0 +1,173 @@
+import math
+import threading
+
+import numpy as np
+
+
+# Largest value the model accepts; scikit-learn scores in float32
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+
+class NonFiniteFeatures(ValueError):
+    """
+    Raised for applicants with infinite features (e.g. an income over a household
+    of zero), which the model cannot score. ``rows`` are their indices in the batch.
+    """
+
+    def __init__(self, rows, columns):
+        super().__init__(f"Features are infinite or too large to score: {', '.join(columns)}.")
+        self.rows = list(rows)
+        self.columns = list(columns)
+
+
+def check_finite_features(features, feature_columns):
+    """
+    Raises ``NonFiniteFeatures`` for rows with an infinite feature (or one beyond float32).
+    Missing values (NaN, e.g. from 0/0) are left alone: the forest routes them itself.
+    """
+    infinite = np.abs(features) > FLOAT32_MAX
+    rows = np.flatnonzero(infinite.any(axis=1))
+    if len(rows):
+        columns = [feature_columns[i] for i in np.flatnonzero(infinite[rows].any(axis=0))]
+        raise NonFiniteFeatures(rows.tolist(), columns)
+
+
+def _ratio(numerator, denominator):
+    """Division by zero as in pandas: 0/0 is NaN and x/0 is an infinity with the sign of x."""
+    if denominator:
+        return numerator / denominator
+    if numerator == 0 or math.isnan(numerator):
+        return math.nan
+    return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+
+
+class FeatureEncoder:
+    """
+    Fills a float32 feature row for one applicant without pandas.
+
+    Built once for a list of model feature columns and their one-hot mapping
+    (``(column_index, categorical_feature, value)`` for every dummy column): every
+    numeric, derived and one-hot column gets a fixed slot, so encoding is a handful
+    of assignments into a reused row. Produces the same values as ``preprocess_input`` (as the model
+    sees them, in float32); categorical values without a training column encode
+    as all zeros, as with ``pd.get_dummies`` and column alignment.
+    """
+
+    def __init__(self, feature_columns, numeric_features, one_hot_mapping):
+        self.feature_columns = tuple(feature_columns)
+        index = {column: i for i, column in enumerate(self.feature_columns)}
+
+        self._numeric = [(index[name], name) for name in numeric_features if name in index]
+        self._derived = {name: index.get(name) for name in (
+            "dependants_per_supporter", "fee_to_income", "household_income_per_person", "requested_to_affordable",
+        )}
+        self._one_hot = {(feature, value): i for i, feature, value in one_hot_mapping}
+        self._one_hot_slots = [i for i, _, _ in one_hot_mapping]
+        self._categorical = list(dict.fromkeys(feature for _, feature, _ in one_hot_mapping))
+        # One reusable row per thread, since requests are scored from a thread pool
+        self._rows = threading.local()
+
+    def _row(self):
+        row = getattr(self._rows, "row", None)
+        if row is None:
+            row = self._rows.row = np.zeros((1, len(self.feature_columns)), dtype=np.float32)
+        return row
+
+    def encode(self, data):
+        """
+        Returns a (1, n_features) float32 row for one applicant's raw fields.
+        The row is reused by the next call on the same thread.
+        """
+        row = self._row()
+        values = row[0]
+        for i, name in self._numeric:
+            values[i] = data[name]
+
+        # Same formulas as compute_features, in float64 before the float32 store
+        derived = {
+            "dependants_per_supporter": _ratio(data["Household Dependants"], data["Household Supporters"] + 1),
+            "fee_to_income": _ratio(data["Fee balance (USD)"], data["Total Monthly Income"] + 1),
+            "household_income_per_person": _ratio(data["Total Monthly Income"], data["Household Size"]),
+            "requested_to_affordable": _ratio(data["Grant Requested"], data["Amount Affordable"] + 1),
+        }
+        for name, i in self._derived.items():
+            if i is not None:
+                values[i] = derived[name]
+
+        values[self._one_hot_slots] = 0.0
+        for feature in self._categorical:
+            i = self._one_hot.get((feature, str(data[feature])))
+            if i is not None:
+                values[i] = 1.0
+
+        return row
+
+
+class FlatForest:
+    """
+    A fitted ``RandomForestClassifier`` flattened into a few NumPy arrays.
+
+    All trees' nodes are concatenated, leaves point to themselves, and each node
+    stores its class distribution and which side missing (NaN) values take.
+    Scoring walks every tree at once,
+    one depth level per step, and averages the leaf distributions: the same
+    probabilities as ``predict_proba``, with the predicted class taken from them
+    instead of a second traversal.
+    """
+
+    def __init__(self, forest):
+        features, thresholds, left, right, missing_left, leaf_values, roots = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            # Trees fitted before scikit-learn 1.3 have no missing-value routing: NaN goes right
+            missing_left.append(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8)))
+
+            # Per-tree predict_proba. scikit-learn >= 1.4 stores class fractions and returns
+            # them as they are; older versions store weighted counts and normalize them.
+            values = tree.value[:, 0, :len(forest.classes_)]
+            totals = values.sum(axis=1, keepdims=True)
+            if (totals > 1.0 + 1e-6).any():
+                totals[totals == 0] = 1.0
+                values = values / totals
+            leaf_values.append(values)
+            offset += tree.node_count
+
+        self.classes_ = forest.classes_
+        self.n_estimators = len(roots)
+        self.max_depth = max(estimator.tree_.max_depth for estimator in forest.estimators_)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.missing_left = np.concatenate(missing_left).astype(bool)
+        self.leaf_values = np.concatenate(leaf_values)
+
+    def leaves(self, X):
+        """Returns the leaf reached in every tree, shape (n_samples, n_estimators)."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_estimators))
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(values), self.missing_left[nodes], values <= self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        # Reducing over the (non-contiguous) tree axis adds the trees one by one, in order,
+        # exactly like the forest's own accumulation, so the result is bit-for-bit the same
+        return self.leaf_values[self.leaves(X)].sum(axis=1) / self.n_estimators
+
+    def predict_with_proba(self, X):
+        """Returns the predicted classes and class probabilities from one traversal."""
+        probabilities = self.predict_proba(X)
+        return self.classes_[np.argmax(probabilities, axis=1)], probabilities
@@ -0,0 +1,84 @@
+"""
+Production serving: gunicorn preforking uvicorn workers.
+
+gunicorn reads this file automatically when started from this directory:
+    gunicorn main:app
+
+The app is imported and the PRELOAD_MODELS are loaded once in the master before
+it forks, so workers share that memory copy-on-write instead of each loading its
+own copy. CPU thread pools (OpenMP/BLAS, torch, TensorFlow, TFLite) are sized per
+worker so that all workers together use about one thread per core, and workers
+are recycled after MAX_REQUESTS requests to bound memory growth.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+# Imported under another name: gunicorn reads every module-level name, and "config" is a setting
+from decouple import config as env
+
+bind = f"0.0.0.0:{env('PORT', default='80')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = env("WEB_CONCURRENCY", default=min(multiprocessing.cpu_count(), 4), cast=int)
+
+# Import the app in the master, so the preloaded models are shared by every worker
+preload_app = True
+
+# Restart a worker after this many requests; the jitter keeps workers from restarting together
+max_requests = env("MAX_REQUESTS", default=1000, cast=int)
+max_requests_jitter = env("MAX_REQUESTS_JITTER", default=100, cast=int)
+# Long PDF validations must not be mistaken for a hung worker
+timeout = env("WORKER_TIMEOUT", default=120, cast=int)
+# Time a recycled or stopped worker gets to finish its in-flight requests and jobs
+graceful_timeout = env("GRACEFUL_TIMEOUT", default=30, cast=int)
+
+
+# Models loaded in the master before forking. TensorFlow is not fork-safe once its runtime
+# has started, so the document validator is left to load in each worker unless listed here.
+PRELOAD_MODELS = env("PRELOAD_MODELS", default="grant_model,sentence_encoder,faq_index")
+
+# CPU threads each worker may use for inference
+THREADS_PER_WORKER = env(
+    "THREADS_PER_WORKER", default=max(1, multiprocessing.cpu_count() // workers), cast=int
+)
+
+# OpenMP/BLAS thread pools that must not be running when the master forks
+FORK_SENSITIVE_THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+# Read once when TensorFlow or the TFLite backend starts, whether in the master or a worker
+THREAD_VARIABLES = ("TF_NUM_INTRAOP_THREADS", "DOCUMENT_TFLITE_THREADS")
+
+WORKER_THREAD_ENV = {
+    name: os.environ.get(name, str(THREADS_PER_WORKER))
+    for name in FORK_SENSITIVE_THREAD_VARIABLES + THREAD_VARIABLES
+}
+WORKER_THREAD_ENV["TF_NUM_INTEROP_THREADS"] = os.environ.get("TF_NUM_INTEROP_THREADS", "1")
+os.environ.update(WORKER_THREAD_ENV)
+# The master only loads models, so it runs single-threaded and forks no thread pools
+os.environ.update({name: "1" for name in FORK_SENSITIVE_THREAD_VARIABLES})
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before the first worker is forked."""
+    from registry import models
+
+    names = [name.strip() for name in PRELOAD_MODELS.split(",") if name.strip() in models.names()]
+    server.log.info("Preloading models before fork: %s", ", ".join(names) or "none")
+    models.warm_up(names, background=False)
+
+    # Move everything loaded so far out of the garbage collector's reach, so collections in
+    # the workers do not write to (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Gives each new worker its share of the CPU threads."""
+    os.environ.update(WORKER_THREAD_ENV)
+    threads = int(WORKER_THREAD_ENV["OMP_NUM_THREADS"])
+
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(threads)
@@ -0,0 +1,165 @@
+import json
+import os
+import time
+import uuid
+
+from sqlite_store import SQLiteStore
+
+# Statuses after which a job no longer changes
+FINAL_STATUSES = ("completed", "failed")
+
+
+class JobStore(SQLiteStore):
+    """
+    SQLite-backed store of background validation jobs.
+
+    Each job is processed by the worker that accepted it, but its status and result
+    live on disk, so a client can poll any worker on the host. Finished jobs are
+    kept for ``ttl`` seconds.
+
+    A worker holds a lease on its unfinished jobs and renews it with ``heartbeat``.
+    Jobs whose lease has not been renewed for ``lease`` seconds belonged to a worker
+    that is gone, and ``fail_orphaned`` fails them. Owners are random per-process
+    tokens rather than PIDs, which are reused after a restart.
+
+    Expired jobs are purged once every ``PURGE_EVERY`` new jobs.
+    """
+
+    def __init__(self, path, ttl=86400, lease=60):
+        self.ttl = ttl
+        self.lease = lease
+        self._owner = None
+        self._owner_pid = None
+        super().__init__(path)
+
+    def _create_schema(self, conn):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'queued',
+                worker_pid INTEGER NOT NULL,
+                owner TEXT NOT NULL DEFAULT '',
+                heartbeat_at REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                response TEXT,
+                error TEXT
+            )
+            """
+        )
+        # Stores created before leases existed get the lease columns; their jobs then expire
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (
+            ("owner", "TEXT NOT NULL DEFAULT ''"),
+            ("heartbeat_at", "REAL NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+
+    @property
+    def owner(self):
+        """This process's owner token; a new one after a fork, since the child holds its own leases."""
+        if self._owner_pid != os.getpid():
+            self._owner, self._owner_pid = uuid.uuid4().hex, os.getpid()
+        return self._owner
+
+    def create(self):
+        """Records a new queued job leased to this process and returns its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO jobs (id, worker_pid, owner, created_at, updated_at, heartbeat_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, os.getpid(), self.owner, now, now, now),
+            )
+            if self.ttl is not None and self._purge_due():
+                conn.execute(
+                    f"DELETE FROM jobs WHERE status IN {FINAL_STATUSES} AND updated_at < ?",
+                    (now - self.ttl,),
+                )
+        return job_id
+
+    def start(self, job_id):
+        """Marks a queued job as running, once a worker picks it up."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+
+    def complete(self, job_id, response):
+        """Records the job's response, unless it has already finished (e.g. failed as orphaned)."""
+        with self._connect() as conn:
+            conn.execute(
+                f"""
+                UPDATE jobs SET status = 'completed', response = ?, updated_at = ?
+                WHERE id = ? AND status NOT IN {FINAL_STATUSES}
+                """,
+                (json.dumps(response), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error):
+        """Records the job's error, unless it has already finished."""
+        with self._connect() as conn:
+            conn.execute(
+                f"""
+                UPDATE jobs SET status = 'failed', error = ?, updated_at = ?
+                WHERE id = ? AND status NOT IN {FINAL_STATUSES}
+                """,
+                (error, time.time(), job_id),
+            )
+
+    def heartbeat(self):
+        """Renews the lease on this process's unfinished jobs; returns how many there are."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status NOT IN {FINAL_STATUSES}",
+                (time.time(), self.owner),
+            )
+        return cursor.rowcount
+
+    def fail_orphaned(self):
+        """Fails other workers' unfinished jobs whose lease has expired, so clients stop waiting on them."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"""
+                UPDATE jobs SET status = 'failed', error = 'The worker processing this job exited.',
+                                updated_at = ?
+                WHERE status NOT IN {FINAL_STATUSES} AND owner != ? AND heartbeat_at < ?
+                """,
+                (now, self.owner, now - self.lease),
+            )
+        return cursor.rowcount
+
+    def get(self, job_id):
+        """Returns the job as a dict, or ``None`` if it does not exist (or has expired)."""
+        # Expired jobs are hidden straight away, not only once they are purged
+        expired_before = time.time() - self.ttl if self.ttl is not None else float("-inf")
+        with self._connect() as conn:
+            row = conn.execute(
+                f"""
+                SELECT id, status, created_at, updated_at, response, error FROM jobs
+                WHERE id = ? AND NOT (status IN {FINAL_STATUSES} AND updated_at < ?)
+                """,
+                (job_id, expired_before),
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = {"job_id": row[0], "status": row[1], "created_at": row[2], "updated_at": row[3]}
+        if row[4] is not None:
+            job["response"] = json.loads(row[4])
+        if row[5] is not None:
+            job["error"] = row[5]
+        return job
+
+    def counts(self):
+        """Returns the number of jobs in each status."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
@@ -1,14 +1,33 @@
-import os
-import tempfile
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import hashlib
+import io
+import logging
+import time
+import unicodedata
+from typing import List, Optional
+from decouple import config
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from utils import validate_document, send_email
-from pydantic import BaseModel
-from utils import predict_grant_category
-from sentence_transformers import SentenceTransformer, util
+from starlette.concurrency import run_in_threadpool
+from utils import validate_document, build_email_params, document_model_version
+from pydantic import BaseModel, Field
+from utils import predict_grant_category, predict_grant_categories
+from grant_scoring import NonFiniteFeatures
+from worker_pool import BoundedPool, PoolSaturated
+from middleware import BodySizeLimitMiddleware, MetricsMiddleware
+from metrics import collector, timed
+from notifications import NotificationDispatcher, NotificationOutbox, TRANSPORTS
+from jobs import FINAL_STATUSES, JobStore
+from registry import models
+from caching import LRUCache, SQLiteCache, TieredCache
+from batching import MicroBatcher
+from faq_index import FAQIndex
+from encoders import load_encoder
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 # Create a FastAPI instance
 app = FastAPI(
     title="Alusive Africa ML Solutions",
@@ -17,132 +36,28 @@ app = FastAPI(
 )
 
 
-# Load the pretrained Sentence Transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-
-# faqs
-faqs = [
-    # Grants
-    {"question": "What is Alusive Africa's Tuition Grant Program?",
-        "answer": "Alusive Africa's tuition grant program is our third of three pillars to support fee-paying students at The African Leadership University in need."},
-    {"question": "When does the next application for Alusive Africa's grant open?",
-        "answer": "While we aim to award grants at least twice every year, our applications open on the basis of fund availability."},
-    {"question": "Who is eligible to apply for the grant?",
-        "answer": "Any student at the African Leadership University in need of some financial support is welcome to apply for Alusive Africa's tuition grant."},
-    {"question": "What does the grant cover?",
-        "answer": "Alusive Africa tuition grant is only meant to go towards tuition support for students at the African Leadership University."},
-    {"question": "What are the criteria for receiving a grant?",
-        "answer": "Applicants of Alusive Africa tuition grant program are evaluated on the basis of need, academic performance and community contribution."},
-    {"question": "How much can one receive for funding?",
-        "answer": "Alusive Africa grant allocations is the result of a holistic evaluation on a case-by-case basis."},
-    {"question": "How is the grant amount determined?",
-        "answer": "Alusive Africa grant allocation is the result of a thorough holistic evaluation on a case-by-case basis."},
-    {"question": "How does one apply for Alusive Africa's Tuition Grant?",
-        "answer": "Alusive Africa tuition grant program opens for application whenever we publish, usually via student email."},
-    {"question": "How long does the application process take?",
-        "answer": "While an application for Alusive Africa's tuition grant program can be done in one sitting, the platform we use allows applicants to pause and resume wherever they left at their convenience."},
-    {"question": "What documents do I need to submit with my application?",
-        "answer": "Supporting documents for any applicant to demonstrate their financial need, academic performance, and community service vary on a case-by-case basis."},
-    {"question": "When will I know the decision regarding my application?",
-        "answer": "We endeavor to open applications for Alusive Africa's tuition grant program towards the end of one trimester and announce the decisions during the next trimester."},
-    {"question": "Can I apply for the grant if I have received it before?",
-        "answer": "Returning applicants are definitely welcome to reapply for Alusive Africa's tuition grant program, even though their priority levels are typically lower."},
-    {"question": "What happens if I receive a partial grant and still need more financial support?",
-        "answer": "While we would like to support Alusive Africa's grant recipients to the best of our ability, our grant might not entirely cover their tuition fee deficit and we encourage them to explore other avenues of funding."},
-    {"question": "Are there any conditions attached to the grant?",
-        "answer": "Yes. Any conditions attached to Alusive Africa's tuition grant program are outlined in the application form, and the grant agreement recipients sign in order to accept their offer."},
-    {"question": "Can I apply for a grant if I already have other scholarships?",
-        "answer": "Yes. Any student in need of financial support towards their tuition at the African Leadership University is welcome to apply for the Alusive Africa tuition grant program."},
-    {"question": "What happens if I drop out or defer my studies after receiving a grant?",
-        "answer": "Only enrolled students are eligible to apply for Alusive Africa's tuition grant program."},
-    {"question": "What is the deadline for grant applications?",
-        "answer": "Alusive Africa grant application deadlines are usually clearly communicated when it opens and is also outlined in the application."},
-    {"question": "How do I increase my chances of getting a grant?",
-        "answer": "Alusive Africa grant allocation is the result of a holistic evaluation on a case-by-case basis so accurate verifiable information to the best of your knowledge is a good place to start."},
-    {"question": "Who can I contact if I have issues with my application?",
-        "answer": "Feel free to contact Alusive Africa via our email at alusiveafrica.rwa@alustudent.com or phone number +250735545222 about any issues unanswered in our chat."},
-
-    # Internships
-    {"question": "What internship opportunities does Alusive Africa offer?",
-        "answer": "Alusive Africa internships offer opportunities in Communication, Marketing and Tech."},
-    {"question": "Who is eligible to apply for an internship?",
-        "answer": "Any enrolled student at the African Leadership University is eligible to apply for Alusive Africa internship."},
-    {"question": "How do I apply for an internship?",
-        "answer": "Alusive Africa internship applications are usually formally announced via student email."},
-    {"question": "Are Alusive Africa internships paid?",
-        "answer": "Yes. All Alusive internships are compensated via Alusive credits."},
-    {"question": "What are Alusive credits?",
-        "answer": "Alusive credits are the payment mode for Alusive internships and are only redeemable toward tuition fees at the African Leadership University."},
-    {"question": "What skills or experience do I need to apply?",
-        "answer": "As an opportunity to start and grow your career, while Alusive Africa internships would benefit from previous expertise, we prioritize a burning desire to learn on the job."},
-    {"question": "How long do internships last?",
-        "answer": "Alusive Africa internships last a trimester."},
-    {"question": "When do Alusive internships begin?",
-        "answer": "Alusive internships usually start at the beginning of a new trimester just after the hiring process is concluded and an agreement accepted by the intern."},
-    {"question": "Can interns work remotely?",
-        "answer": "Yes. Depending on the role, Alusive internships can be virtual, hybrid or in-person."},
-    {"question": "What are the responsibilities of an intern?",
-        "answer": "Every role for every internship position at Alusive Africa has different responsibilities clearly outlined in the job description on the internship agreement form."},
-    {"question": "Will I receive a certificate or recommendation letter after completing the internship?",
-        "answer": "Yes. While Alusive Africa does not provide a certificate after completing the internship, we are more than happy to provide you with a letter of completion and a recommendation letter upon request otherwise a formal email is what we share at the beginning and end of each internship."},
-    {"question": "Can an internship lead to a long-term role with Alusive Africa?",
-        "answer": "Yes. Alusive Africa internship can definitely lead to a long-term role."},
-    {"question": "How competitive is the internship application process?",
-        "answer": "Alusive internships are very competitive, given the large pool of applicants."},
-    {"question": "What support do interns receive during their internship?",
-        "answer": "Alusive interns received robust professional support necessary for their growth during the full period of the internship."},
-    {"question": "How many interns does Alusive Africa recruit each cycle?",
-        "answer": "The number of interns recruited by Alusive Africa during any internship cycle depends on our need during that period."},
-    {"question": "Can I apply if I am a first-year student?",
-        "answer": "Yes. All eligible enrolled students are welcome to apply for the Alusive Africa internship irrespective of their year of study."},
-    {"question": "What happens if I need to leave the internship early?",
-        "answer": "Tendering a notice with your intent to leave should be done 2 weeks in advance for proper team adjustments."},
-    {"question": "Do interns get to work on real projects?",
-        "answer": "Yes. All Alusive Africa internship projects are real-world and consequential."},
-    {"question": "Is there any mentorship provided during the internship?",
-        "answer": "Yes. Career development through mentorship is a core part of the Alusive Africa internship."},
-    {"question": "Can I apply for both an internship and a grant at the same time?",
-        "answer": "Yes. Eligible candidates are welcome to apply for both the internship and grant at Alusive Africa."},
-    {"question": "Do interns receive any training or onboarding?",
-        "answer": "Yes. A comprehensive training and onboarding process is primary for every cycle of Alusive Africa internship."},
-
-    # Student Venture Support
-    {"question": "What kind of support does Alusive Africa offer to student entrepreneurs?",
-        "answer": "At this time, Alusive Africa offers support through meaningful partnerships with student ventures with whom we share goals."},
-    {"question": "Who is eligible for student venture support?",
-        "answer": "All enrolled students interested in Alusive student venture support are welcome to apply by sending their proposal to Alusive Africa via email."},
-    {"question": "Does Alusive Africa provide funding for student startups?",
-        "answer": "No. At this time, our funding model has yet to directly extend cash support to student startups."},
-    {"question": "How can I apply for venture support?",
-        "answer": "Writing a proposal to us at Alusive Africa through our email address is how to apply for student venture support."},
-    {"question": "What types of businesses does Alusive Africa support?",
-        "answer": "Alusive Africa supports all business ventures that pass our evaluation for meaningful partnership."},
-    {"question": "Do I need to be part of a team to receive support?",
-        "answer": "No. You don't need to be part of a team to receive support."},
-    {"question": "Can I apply if my venture is still in the idea stage?",
-        "answer": "Yes. Eligible students are welcome to apply no matter the stage they are in their business."},
-    {"question": "Are there networking opportunities for student founders?",
-        "answer": "Yes. Plenty of networking opportunities exist for student founders who partner with Alusive Africa."},
-    {"question": "Does Alusive Africa take any equity in student startups?",
-        "answer": "Not yet. Our partnership model is yet to explore taking a stake in terms of equity in student startups."},
-    {"question": "Can I apply for both a grant and venture support?",
-        "answer": "Yes. Eligible applicants are more than welcome to apply for both Alusive grants and our student venture support."},
-
-    # General
-    {"question": "What is Alusive Africa?", "answer": "Alusive Africa is a student-led non-profit organization based at the African Leadership University on a mission to support fee-paying students with our grants, offer career development opportunities through our internships and invest in student-led ventures."},
-    {"question": "What does Alusive Africa do?", "answer": "Alusive Africa facilitates grant-based tuition support, contributes towards student career development opportunities and collaborates with other student-led ventures to foster community development through initiatives like the Giveaway4Good."},
-    {"question": "How does Alusive Africa raise funds for grants?",
-        "answer": "Alusive Africa raises its funding through donations, partnerships, and fundraising initiatives. The organization is also working toward establishing 501(c)(3) status in the U.S. to expand its fundraising capabilities."},
-    {"question": "What is the Giveaway4Good initiative?",
-        "answer": "The Giveaway4Good is an initiative under Alusive Africa that partners with other student-led ventures to equip, enable and empower fellow students, emerging talents and aspiring founders."},
-    {"question": "How can I support Alusive Africa?",
-        "answer": "You can support Alusive Africa by Donating to the grant fund, Partnering with the organization, Volunteering or contributing skills, and Spreading awareness about its mission."},
-    {"question": "Is Alusive Africa affiliated with African Leadership University (ALU)?", "answer": "Yes. While Alusive Africa currently operates within the African Leadership University and primarily supports its students, it is an independent initiative working toward becoming a legally registered non-profit entity while still investing in our relationship with the African Leadership University as a founding partner."},
-    {"question": "What is the long-term vision of Alusive Africa?", "answer": "The long-term vision is to establish Alusive Africa as a fully independent legal entity, expand its impact beyond ALU, and create a sustainable, student-led structure that continues to provide financial support, career development opportunities and venture support to students across Africa."},
-    {"question": "How can I contact Alusive Africa?",
-        "answer": "Alusive Africa can be contacted via email at alusiveafrica.rwa@alustudent.com or phone number at +250735545222."},
-]
+# Load the pretrained Sentence Transformer model (on first use)
+SENTENCE_MODEL_NAME = "all-MiniLM-L6-v2"
+# Encoder backend: "torch", "torch-int8", "onnx" or "onnx-int8" (see encoders.py)
+CHAT_ENCODER_BACKEND = config("CHAT_ENCODER_BACKEND", default="torch")
+# Questions per encoder call, and per /chat/batch/ request
+CHAT_ENCODE_BATCH_SIZE = config("CHAT_ENCODE_BATCH_SIZE", default=32, cast=int)
+CHAT_MAX_BATCH_QUESTIONS = config("CHAT_MAX_BATCH_QUESTIONS", default=100, cast=int)
+
+
+models.register("sentence_encoder", lambda: load_encoder(SENTENCE_MODEL_NAME, CHAT_ENCODER_BACKEND))
+
+
+# FAQ knowledge base, loaded from a data file with its embeddings cached on disk
+FAQ_DATA_PATH = config("FAQ_DATA_PATH", default="data/faqs.json")
+FAQ_CACHE_DIR = config("FAQ_CACHE_DIR", default="var/faq_cache")
+faq_index = FAQIndex(
+    FAQ_DATA_PATH,
+    FAQ_CACHE_DIR,
+    # Backends give slightly different embeddings, so each caches its own
+    f"{SENTENCE_MODEL_NAME}@{CHAT_ENCODER_BACKEND}",
+    backend=config("FAQ_INDEX_BACKEND", default="exact"),
+)
 
 
 # Feature columns (ensure this matches the feature columns used in your training data)
@@ -172,6 +87,9 @@ FEATURE_COLUMNS = [
     "Previous Alusive Grant Status_Yes",
 ]
 
+# Largest cohort accepted by /predict-grant/batch/ in a single request
+MAX_GRANT_BATCH_SIZE = config("MAX_GRANT_BATCH_SIZE", default=10000, cast=int)
+
 
 # Define expected request body
 # Define the input data model for the applicant
@@ -192,6 +110,155 @@ class ApplicantData(BaseModel):
     amount_affordable: float
 
 
+# Largest document accepted by /validate/, enforced while the upload streams in
+MAX_UPLOAD_BYTES = config("MAX_UPLOAD_BYTES", default=10 * 1024 * 1024, cast=int)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Allowance for the multipart boundaries and form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    paths=["/validate/", "/validate/jobs/"],
+)
+
+
+# Pages checked for a signature when the request does not say ("1" = last page only, or "all")
+SIGNATURE_SCAN_PAGES = config("SIGNATURE_SCAN_PAGES", default="1")
+
+
+# Document validation runs in its own pool so PDF rendering and inference never block the event loop
+validation_pool = BoundedPool(
+    "validation",
+    max_workers=config("VALIDATION_POOL_WORKERS", default=2, cast=int),
+    max_queue=config("VALIDATION_POOL_QUEUE", default=8, cast=int),
+    kind=config("VALIDATION_POOL_KIND", default="thread"),
+    retry_after=config("VALIDATION_RETRY_AFTER", default=5, cast=int),
+)
+
+
+@app.on_event("shutdown")
+def shutdown_validation_pool():
+    validation_pool.shutdown(wait=False)
+
+
+# Validation results keyed by the SHA-256 of the upload, so re-uploads skip rendering and inference.
+# An in-process LRU tier, plus an optional on-disk tier (VALIDATION_CACHE_DB_PATH) that survives restarts.
+VALIDATION_CACHE_TTL = config("VALIDATION_CACHE_TTL", default=86400, cast=float)
+VALIDATION_CACHE_DB_PATH = config("VALIDATION_CACHE_DB_PATH", default="")
+validation_cache = TieredCache(
+    LRUCache(maxsize=config("VALIDATION_CACHE_SIZE", default=512, cast=int), ttl=VALIDATION_CACHE_TTL),
+    *([SQLiteCache(VALIDATION_CACHE_DB_PATH, ttl=VALIDATION_CACHE_TTL)] if VALIDATION_CACHE_DB_PATH else []),
+)
+
+
+def validation_cache_key(document_bytes: bytes, scan_pages: int, early_exit: bool):
+    """Upload hash plus everything else the result depends on: model version and scan options."""
+    digest = hashlib.sha256(document_bytes).hexdigest()
+    return f"{digest}:{document_model_version()}:{scan_pages}:{int(early_exit)}"
+
+
+def cached_validation(document_bytes: bytes, scan_pages: int, early_exit: bool):
+    """
+    Returns the cache key and the cached result for an upload, or ``None`` on a miss.
+    A hit is marked ``cached`` and its timings are this lookup's, not the original validation's.
+    """
+    start = time.perf_counter()
+    cache_key = validation_cache_key(document_bytes, scan_pages, early_exit)
+    result = validation_cache.get(cache_key)
+    if result is not None:
+        result = {**result, "cached": True, "timings": {"cache_lookup_ms": (time.perf_counter() - start) * 1000}}
+    return cache_key, result
+
+
+# Background validation jobs (/validate/jobs/), shared by every worker on the host
+job_store = JobStore(
+    config("JOB_DB_PATH", default="var/jobs.sqlite3"),
+    ttl=config("JOB_TTL", default=86400, cast=float),
+    # A job whose worker has not renewed its lease for this long is failed by the other workers
+    lease=config("JOB_LEASE", default=60, cast=float),
+)
+# How often a job WebSocket checks the store for a status change, in seconds
+JOB_POLL_INTERVAL = config("JOB_POLL_INTERVAL", default=0.25, cast=float)
+background_jobs = set()
+
+
+job_lease_task = None
+
+
+async def renew_job_leases():
+    """Renews this worker's job leases and fails jobs whose worker stopped renewing them."""
+    while True:
+        try:
+            await run_in_threadpool(job_store.heartbeat)
+            await run_in_threadpool(job_store.fail_orphaned)
+        except Exception:
+            logger.exception("Renewing validation job leases failed")
+        await asyncio.sleep(job_store.lease / 4)
+
+
+@app.on_event("startup")
+async def start_job_leases():
+    global job_lease_task
+    job_lease_task = asyncio.create_task(renew_job_leases())
+
+
+# Longest a stopping worker (e.g. one recycled by gunicorn) waits for its in-flight jobs
+JOB_DRAIN_TIMEOUT = config("JOB_DRAIN_TIMEOUT", default=25, cast=float)
+
+
+@app.on_event("shutdown")
+async def drain_background_jobs():
+    if background_jobs:
+        await asyncio.wait(list(background_jobs), timeout=JOB_DRAIN_TIMEOUT)
+    # Leases are renewed until the in-flight jobs are done; any left over then expire
+    if job_lease_task is not None:
+        job_lease_task.cancel()
+
+
+# Outgoing emails are persisted to a local outbox and delivered by a background dispatcher
+notification_dispatcher = NotificationDispatcher(
+    NotificationOutbox(
+        config("NOTIFICATION_DB_PATH", default="var/notifications.sqlite3"),
+        retention=config("NOTIFICATION_RETENTION", default=7 * 86400, cast=float),
+    ),
+    TRANSPORTS[config("NOTIFICATION_TRANSPORT", default="resend")](),
+    batch_size=config("NOTIFICATION_BATCH_SIZE", default=50, cast=int),
+    max_attempts=config("NOTIFICATION_MAX_ATTEMPTS", default=6, cast=int),
+    # Identical emails (same recipient and body) are sent once per window
+    dedup_window=config("NOTIFICATION_DEDUP_WINDOW", default=600, cast=float),
+)
+
+
+@app.on_event("startup")
+def start_notification_dispatcher():
+    notification_dispatcher.start()
+
+
+@app.on_event("shutdown")
+def stop_notification_dispatcher():
+    notification_dispatcher.stop()
+
+
+# Models loaded in the background at startup: "all", "none", or a comma-separated list of
+# names. A worker that only serves /chat/ can use "sentence_encoder,faq_index".
+WARMUP_MODELS = config("WARMUP_MODELS", default="all")
+
+
+def warmup_model_names():
+    value = WARMUP_MODELS.strip().lower()
+    if value == "all":
+        return models.names()
+    if value in ("", "none"):
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+@app.on_event("startup")
+def start_model_warm_up():
+    models.warm_up(warmup_model_names())
+
+
 # Allow CORS (optional)
 app.add_middleware(
     CORSMiddleware,
@@ -201,6 +268,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counters and latency for /metrics; optionally profile a sample of requests with cProfile
+app.add_middleware(
+    MetricsMiddleware,
+    collector=collector,
+    profile_sample_rate=config("PROFILE_SAMPLE_RATE", default=0.0, cast=float),
+    profile_dir=config("PROFILE_DIR", default="var/profiles"),
+)
+
 
 # Email & Notification message templates
 def generate_messages(first_name, last_name, document_type, status):
@@ -236,69 +311,270 @@ def generate_messages(first_name, last_name, document_type, status):
     return {"notification": notification, "email": email}
 
 
+def parse_scan_pages(value: Optional[str]):
+    """Parses the `scan_pages` form field: a page count, or `all` (returned as 0)."""
+    value = (value or SIGNATURE_SCAN_PAGES).strip().lower()
+    if value == "all":
+        return 0
+    if not value.isdigit() or int(value) < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid scan_pages. Must be a positive number of pages or 'all'.",
+        )
+    return int(value)
+
+
+async def read_upload(document: UploadFile, limit=MAX_UPLOAD_BYTES):
+    """Reads an upload into memory chunk by chunk, stopping as soon as it exceeds ``limit``."""
+    too_large = HTTPException(
+        status_code=413, detail=f"File too large. Limit is {limit} bytes."
+    )
+    if document.size is not None and document.size > limit:
+        raise too_large
+
+    buffer = io.BytesIO()
+    with timed("upload_read"):
+        while True:
+            chunk = await document.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if buffer.tell() + len(chunk) > limit:
+                raise too_large
+            buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def check_document_type(document_type: str):
+    if document_type not in ["grant", "internship"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid document type. Must be 'grant' or 'internship'.",
+        )
+
+
+def saturated_error(e: PoolSaturated):
+    return HTTPException(
+        status_code=503,
+        detail="Document validation is at capacity. Please try again shortly.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def validation_response(result, full_name: str, email: str, document_type: str):
+    """Builds the `/validate/` response for a validation result and queues its email."""
+    # Extract first and last name
+    name_parts = full_name.strip().split()
+    first_name = name_parts[0]  # First word is the first name
+    last_name = (
+        " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
+    )  # Rest is last name
+
+    # Generate messages based on validation result
+    document_status = result["prediction"]  # "signed" or "unsigned"
+    messages = generate_messages(
+        first_name, last_name, document_type, document_status)
+
+    # Queue the email notification; it is delivered in the background
+    with timed("email_enqueue"):
+        notification_dispatcher.enqueue(build_email_params(email, messages["email"]))
+
+    return {
+        "full_name": full_name,
+        "email": email,
+        "document_type": document_type,
+        "result": result,
+        "notification": messages["notification"],
+    }
+
+
 @app.post("/validate/")
 async def validate_file(
     document: UploadFile = File(...),
     full_name: str = Form(...),
     email: str = Form(...),
     document_type: str = Form(...),
+    scan_pages: Optional[str] = Form(None),
+    early_exit: bool = Form(False),
 ):
     """
     Handles document verification.
 
     - Accepts a document file and metadata (`full_name`, `email`, `document_type`).
+    - Optional `scan_pages` checks the last N pages (or `all`) for a signature instead of
+      only the last page; `early_exit` stops at the first signed page.
     - Validates document type (`grant` or `internship`).
     - Uses the `validate_document` function from `utils.py`.
     - Returns analysis results with metadata and personalized messages.
     """
     # Validate document type
-    if document_type not in ["grant", "internship"]:
+    check_document_type(document_type)
+    pages_to_scan = parse_scan_pages(scan_pages)
+
+    # Read the upload into memory, rejecting oversized files early
+    document_bytes = await read_upload(document)
+
+    try:
+        # Re-uploads of the same file reuse the stored result
+        cache_key, result = await run_in_threadpool(
+            cached_validation, document_bytes, pages_to_scan, early_exit
+        )
+        if result is None:
+            # Perform document validation off the event loop, in the bounded pool
+            result = await validation_pool.run(
+                validate_document, document_bytes, document.filename, pages_to_scan, early_exit
+            )
+            await run_in_threadpool(validation_cache.set, cache_key, result)
+    except PoolSaturated as e:
+        raise saturated_error(e)
+    except Exception as e:
         raise HTTPException(
-            status_code=400,
-            detail="Invalid document type. Must be 'grant' or 'internship'.",
+            status_code=500, detail=f"Error processing document: {str(e)}"
         )
 
-    # Extract first and last name
-    name_parts = full_name.strip().split()
-    first_name = name_parts[0]  # First word is the first name
-    last_name = (
-        " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
-    )  # Rest is last name
+    # Prepare response
+    response_data = await run_in_threadpool(
+        validation_response, result, full_name, email, document_type
+    )
+    return JSONResponse(content=response_data)
+
+
+def run_validation_job(job_id, document_bytes, filename, scan_pages, early_exit):
+    """Pool task of a background job: marks the job running once a worker picks it up, then validates."""
+    job_store.start(job_id)
+    return validate_document(document_bytes, filename, scan_pages, early_exit)
+
+
+async def finish_validation_job(job_id, pending, cached, cache_key, full_name, email, document_type):
+    """Waits for a job's validation result and records the `/validate/` response in the job store."""
+    try:
+        if cached is not None:
+            result = cached
+        else:
+            result = await asyncio.wrap_future(pending)
+            await run_in_threadpool(validation_cache.set, cache_key, result)
+        response_data = await run_in_threadpool(
+            validation_response, result, full_name, email, document_type
+        )
+    except Exception as e:
+        await run_in_threadpool(job_store.fail, job_id, f"Error processing document: {str(e)}")
+    else:
+        await run_in_threadpool(job_store.complete, job_id, response_data)
+
+
+@app.post("/validate/jobs/", status_code=202, summary="Queue a document for validation")
+async def submit_validation_job(
+    document: UploadFile = File(...),
+    full_name: str = Form(...),
+    email: str = Form(...),
+    document_type: str = Form(...),
+    scan_pages: Optional[str] = Form(None),
+    early_exit: bool = Form(False),
+):
+    """
+    Accepts the same form as `/validate/` but returns a job ID right away.
 
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=os.path.splitext(document.filename)[-1]
-    ) as temp_file:
-        temp_file.write(await document.read())
-        temp_path = temp_file.name
+    The document is validated in the background; poll `/validate/jobs/{job_id}` or open
+    the `/validate/jobs/{job_id}/ws` WebSocket for the `/validate/` response.
+    """
+    check_document_type(document_type)
+    pages_to_scan = parse_scan_pages(scan_pages)
+    document_bytes = await read_upload(document)
 
+    # The job is recorded before any work is submitted, so no work runs without a job to report to
     try:
-        # Perform document validation
-        result = validate_document(temp_path)
+        job_id = await run_in_threadpool(job_store.create)
     except Exception as e:
         raise HTTPException(
-            status_code=500, detail=f"Error processing document: {str(e)}"
+            status_code=500, detail=f"Error queueing document: {str(e)}"
         )
-    finally:
-        os.remove(temp_path)  # Cleanup temp file
-
-    # Generate messages based on validation result
-    document_status = result["prediction"]  # "signed" or "unsigned"
-    messages = generate_messages(
-        first_name, last_name, document_type, document_status)
 
-    # Send email notification
-    send_email(email, messages["email"])
+    try:
+        cache_key, cached = await run_in_threadpool(
+            cached_validation, document_bytes, pages_to_scan, early_exit
+        )
+        pending = None
+        if cached is None:
+            # Claim a pool slot now, so a saturated pool is reported to the client instead of queued silently
+            pending = validation_pool.submit(
+                run_validation_job, job_id, document_bytes, document.filename, pages_to_scan, early_exit
+            )
+    except PoolSaturated as e:
+        await run_in_threadpool(job_store.fail, job_id, str(e))
+        raise saturated_error(e)
+    except Exception as e:
+        await run_in_threadpool(job_store.fail, job_id, f"Error processing document: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error processing document: {str(e)}"
+        )
 
-    # Prepare response
-    response_data = {
-        "full_name": full_name,
-        "email": email,
-        "document_type": document_type,
-        "result": result,
-        "notification": messages["notification"],
+    task = asyncio.create_task(
+        finish_validation_job(job_id, pending, cached, cache_key, full_name, email, document_type)
+    )
+    # Keep a reference until the task is done, so it is not garbage collected mid-flight
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/validate/jobs/{job_id}",
+            "websocket_url": f"/validate/jobs/{job_id}/ws",
+        },
+    )
+
+
+@app.get("/validate/jobs/{job_id}", summary="Status of a document validation job")
+async def validation_job_status(job_id: str):
+    """Returns the job status, and the `/validate/` response once it has completed."""
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.websocket("/validate/jobs/{job_id}/ws")
+async def validation_job_updates(websocket: WebSocket, job_id: str):
+    """Sends the job on every status change and closes once it has completed or failed."""
+    await websocket.accept()
+    last_status = None
+    try:
+        while True:
+            job = await run_in_threadpool(job_store.get, job_id)
+            if job is None:
+                await websocket.send_json({"job_id": job_id, "status": "not_found"})
+                break
+            if job["status"] != last_status:
+                await websocket.send_json(job)
+                last_status = job["status"]
+            if last_status in FINAL_STATUSES:
+                break
+            # The job may be running in another worker, so its status is polled from the store
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+
+def applicant_to_dict(applicant: ApplicantData):
+    """Converts the request model into the column names used by the grant model."""
+    return {
+        "Academic Standing": applicant.academic_standing,
+        "Disciplinary Standing": applicant.disciplinary_standing,
+        "Financial Standing": applicant.financial_standing,
+        "ALU Grant Status": applicant.alu_grant_status,
+        "Previous Alusive Grant Status": applicant.previous_alusive_grant,
+        "Fee balance (USD)": applicant.fee_balance,
+        "Total Monthly Income": applicant.total_monthly_income,
+        "Students in Household": applicant.students_in_household,
+        "Household Size": applicant.household_size,
+        "Household Supporters": applicant.household_supporters,
+        "Household Dependants": applicant.household_dependants,
+        "ALU Grant Amount": applicant.alu_grant_amount,
+        "Grant Requested": applicant.grant_requested,
+        "Amount Affordable": applicant.amount_affordable,
     }
-    return JSONResponse(content=response_data)
 
 
 # Define the API endpoint to predict the grant category
@@ -309,22 +585,7 @@ def predict_grant(applicant: ApplicantData):
     """
     try:
         # Convert input data to dictionary
-        applicant_data = {
-            "Academic Standing": applicant.academic_standing,
-            "Disciplinary Standing": applicant.disciplinary_standing,
-            "Financial Standing": applicant.financial_standing,
-            "ALU Grant Status": applicant.alu_grant_status,
-            "Previous Alusive Grant Status": applicant.previous_alusive_grant,
-            "Fee balance (USD)": applicant.fee_balance,
-            "Total Monthly Income": applicant.total_monthly_income,
-            "Students in Household": applicant.students_in_household,
-            "Household Size": applicant.household_size,
-            "Household Supporters": applicant.household_supporters,
-            "Household Dependants": applicant.household_dependants,
-            "ALU Grant Amount": applicant.alu_grant_amount,
-            "Grant Requested": applicant.grant_requested,
-            "Amount Affordable": applicant.amount_affordable,
-        }
+        applicant_data = applicant_to_dict(applicant)
 
         # Call the predict_grant_category function from utils.py
         result = predict_grant_category(applicant_data, FEATURE_COLUMNS)
@@ -332,46 +593,278 @@ def predict_grant(applicant: ApplicantData):
         # Return the result of the prediction
         return result
 
+    except NonFiniteFeatures as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         # Return an HTTP error with a message if something goes wrong
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Precompute embeddings
-faq_questions = [faq["question"] for faq in faqs]
-faq_embeddings = model.encode(faq_questions, convert_to_tensor=True)
+# Define the API endpoint to score a whole cohort of applicants at once
+@app.post("/predict-grant/batch/")
+def predict_grant_batch(applicants: List[ApplicantData]):
+    """
+    API endpoint to predict grant categories for a list of applicants.
+
+    - Builds the feature matrix for the whole batch with NumPy.
+    - Runs the random forest once per batch.
+    - Returns one result per applicant, in request order.
+    - Answers 422 with the indices of applicants whose features are infinite, without scoring any.
+    """
+    if len(applicants) > MAX_GRANT_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large. At most {MAX_GRANT_BATCH_SIZE} applicants per request.",
+        )
+
+    try:
+        applicants_data = [applicant_to_dict(applicant) for applicant in applicants]
+        return predict_grant_categories(applicants_data, FEATURE_COLUMNS)
+
+    except NonFiniteFeatures as e:
+        # Name the applicants to fix; nothing in the batch is scored
+        raise HTTPException(status_code=422, detail={"message": str(e), "rows": e.rows})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Load the FAQ entries and their embeddings (on first use)
+models.register(
+    "faq_index",
+    lambda: faq_index.load(
+        lambda questions: models.get("sentence_encoder").encode(
+            questions, batch_size=CHAT_ENCODE_BATCH_SIZE, normalize_embeddings=True
+        )
+    ),
+)
 
 
 # Request model for API
 class QuestionRequest(BaseModel):
     question: str
+    top_k: int = Field(1, ge=1, le=20)
+
+
+class QuestionBatchRequest(BaseModel):
+    questions: List[str]
+    top_k: int = Field(1, ge=1, le=20)
+
+
+# Cache in front of get_answer: answers keyed on the normalized question, so repeated
+# questions skip the transformer forward pass
+answer_cache = LRUCache(
+    maxsize=config("CHAT_ANSWER_CACHE_SIZE", default=1024, cast=int),
+    ttl=config("CHAT_ANSWER_CACHE_TTL", default=3600, cast=float),
+)
+
+
+def normalize_question(question: str):
+    """Case-, punctuation- and whitespace-insensitive cache key for a question."""
+    question = unicodedata.normalize("NFKC", question).casefold()
+    question = "".join(" " if unicodedata.category(char).startswith("P") else char for char in question)
+    return " ".join(question.split())
+
+
+def encode_questions(questions: List[str]):
+    """Encodes a list of questions with one encoder call."""
+    model = models.get("sentence_encoder")
+    with timed("chat_encode"):
+        return list(model.encode(questions, batch_size=CHAT_ENCODE_BATCH_SIZE, normalize_embeddings=True))
+
+
+def rank_answers(embeddings, top_k=1):
+    """
+    Finds the best FAQ answers for question embeddings with one index search
+    (a single similarity matrix multiply, or the ANN index when enabled).
+    """
+    index = models.get("faq_index")
+    with timed("chat_similarity"):
+        best_match_indices, similarity_scores = index.search(np.stack(embeddings), top_k)
+
+    results = []
+    for matches, scores in zip(best_match_indices, similarity_scores):
+        best_match_idx, similarity_score = matches[0], float(scores[0])
+
+        # Set a threshold to filter out low-confidence responses
+        if similarity_score > 0.6:  # Adjust as needed
+            result = {
+                "answer": index.entries[best_match_idx]["answer"],
+                "confidence": similarity_score,
+            }
+        else:
+            result = {
+                "answer": "Sorry, I couldn't find a good match for your question. Try rephrasing it or contact us at alusiveafrica.rwa@alustudent.com for help.",
+                "confidence": similarity_score,
+            }
+
+        if top_k > 1:
+            result["matches"] = [
+                {
+                    "question": index.entries[match]["question"],
+                    "answer": index.entries[match]["answer"],
+                    "confidence": float(score),
+                }
+                for match, score in zip(matches, scores)
+            ]
+        results.append(result)
+    return results
+
+
+# Questions from concurrent requests are coalesced into shared encoder batches
+chat_batcher = MicroBatcher(
+    encode_questions,
+    max_batch_size=CHAT_ENCODE_BATCH_SIZE,
+    max_wait_ms=config("CHAT_COALESCE_WAIT_MS", default=5.0, cast=float),
+    name="chat-batcher",
+)
+
+
+def _cached_answers(questions: List[str], top_k):
+    """Looks questions up in the answer cache; returns their keys, results and the misses."""
+    keys = [(normalize_question(question), top_k) for question in questions]
+    results = [answer_cache.get(key) for key in keys]
+    return keys, results, [i for i, result in enumerate(results) if result is None]
+
+
+def _fill_answers(keys, results, missing, answered):
+    for i, result in zip(missing, answered):
+        answer_cache.set(keys[i], result)
+        results[i] = result
+    return [dict(result) for result in results]
+
+
+async def get_answers(questions: List[str], top_k=1):
+    """Answers several questions without blocking the event loop."""
+    keys, results, missing = _cached_answers(questions, top_k)
+    answered = []
+    if missing:
+        embeddings = await asyncio.wrap_future(chat_batcher.submit([questions[i] for i in missing]))
+        answered = await run_in_threadpool(rank_answers, embeddings, top_k)
+    return _fill_answers(keys, results, missing, answered)
 
 
 # Function to get the best answer
-def get_answer(user_question: str):
-    user_embedding = model.encode(user_question, convert_to_tensor=True)
-    similarities = util.cos_sim(user_embedding, faq_embeddings)
-    best_match_idx = np.argmax(similarities)
-    similarity_score = similarities[0][best_match_idx].item()
-
-    # Set a threshold to filter out low-confidence responses
-    if similarity_score > 0.6:  # Adjust as needed
-        return {
-            "answer": faqs[best_match_idx]["answer"],
-            "confidence": similarity_score,
-        }
-    else:
-        return {
-            "answer": "Sorry, I couldn't find a good match for your question. Try rephrasing it or contact us at alusiveafrica.rwa@alustudent.com for help.",
-            "confidence": similarity_score,
-        }
+def get_answer(user_question: str, top_k=1):
+    keys, results, missing = _cached_answers([user_question], top_k)
+    answered = rank_answers(chat_batcher([user_question]), top_k) if missing else []
+    return _fill_answers(keys, results, missing, answered)[0]
 
 # Define API endpoint
 
 
 @app.post("/chat/", summary="Ask the chatbot a question")
 async def chat(request: QuestionRequest):
-    return get_answer(request.question)
+    # Encoding runs on the batcher thread, shared with concurrent requests
+    return (await get_answers([request.question], request.top_k))[0]
+
+
+@app.post("/chat/batch/", summary="Ask the chatbot several questions at once")
+async def chat_batch(request: QuestionBatchRequest):
+    if len(request.questions) > CHAT_MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many questions. At most {CHAT_MAX_BATCH_QUESTIONS} per request.",
+        )
+    return await get_answers(request.questions, request.top_k)
+
+
+# Readiness, metrics and stats endpoints
+@app.get("/ready", summary="Readiness Endpoint")
+async def ready():
+    """Reports which models are loaded; answers 503 until every warm-up model is ready."""
+    status = models.status()
+    is_ready = all(status[name]["loaded"] for name in warmup_model_names() if name in status)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": status},
+    )
+
+
+# Gauges read when /metrics is scraped
+collector.gauge(
+    "model_load_seconds",
+    lambda: {(("model", name),): info["load_seconds"] for name, info in models.status().items()},
+    "Time taken to load each model.",
+)
+collector.gauge(
+    "model_loaded",
+    lambda: {(("model", name),): info["loaded"] for name, info in models.status().items()},
+    "Whether each model is loaded (1) or not yet (0).",
+)
+collector.gauge(
+    "notification_outbox_messages",
+    lambda: {(("status", status),): count for status, count in notification_dispatcher.outbox.counts().items()},
+    "Email outbox messages by status.",
+)
+collector.gauge(
+    "validation_jobs",
+    lambda: {(("status", status),): count for status, count in job_store.counts().items()},
+    "Background validation jobs by status.",
+)
+
+
+@app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timers, request and error counters, pool and batching histograms and model load times."""
+    body = await run_in_threadpool(collector.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats/validation-pool/", summary="Document validation pool metrics")
+async def validation_pool_stats():
+    """Reports pool occupancy, rejections, and queue wait / execution time histograms."""
+    return validation_pool.stats()
+
+
+@app.get("/stats/document-batching/", summary="Document model micro-batching metrics")
+async def document_batching_stats():
+    """Reports batch size, queue wait and batch latency histograms for the document model."""
+    if not models.is_loaded("document_validator"):
+        return {"loaded": False}
+    scheduler = models.get("document_validator").scheduler
+    if scheduler is None:
+        return {"loaded": True, "enabled": False}
+    return {"loaded": True, "enabled": True, **scheduler.stats()}
+
+
+@app.get("/stats/validation-cache/", summary="Document validation result cache metrics")
+async def validation_cache_stats():
+    """Reports size and hit/miss counters of each validation result cache tier."""
+    return await run_in_threadpool(validation_cache.stats)
+
+
+@app.get("/stats/validation-jobs/", summary="Background validation job status")
+async def validation_job_stats():
+    """Reports the number of jobs in each status and those still running in this worker."""
+    counts = await run_in_threadpool(job_store.counts)
+    return {"in_flight": len(background_jobs), "jobs": counts}
+
+
+@app.get("/stats/notifications/", summary="Email notification outbox status")
+async def notification_stats():
+    """Reports whether the dispatcher is running and how many emails are in each state."""
+    return await run_in_threadpool(notification_dispatcher.stats)
+
+
+@app.get("/stats/chat-cache/", summary="Chatbot cache metrics")
+async def chat_cache_stats():
+    """Reports size, hit/miss counters, evictions and expirations of the chatbot answer cache."""
+    return {"answers": answer_cache.stats()}
+
+
+@app.get("/stats/faq-index/", summary="FAQ index status")
+async def faq_index_stats():
+    """Reports the FAQ entry count, embedding model, content hash and search backend."""
+    if not models.is_loaded("faq_index"):
+        return {"loaded": False}
+    return {"loaded": True, **faq_index.stats()}
+
+
+@app.get("/stats/chat-batching/", summary="Chatbot encoder coalescing metrics")
+async def chat_batching_stats():
+    """Reports batch size, queue wait and batch latency histograms for the chatbot encoder."""
+    return chat_batcher.stats()
+
 
 # Root endpoint
 
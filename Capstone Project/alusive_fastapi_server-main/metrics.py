@@ -0,0 +1,165 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a few milliseconds up to slow PDF renders
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Thread-safe bucketed histogram of observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Returns cumulative bucket counts plus count, sum and mean."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsCollector:
+    """
+    Named counters, histograms and gauges, rendered in the Prometheus text format.
+
+    Each metric name can have several label sets, e.g. one histogram per stage.
+    Histograms owned by other objects (pools, batchers) can be attached with
+    ``attach_histogram`` and gauges are read from callbacks at render time.
+    """
+
+    def __init__(self):
+        self._help = {}
+        self._types = {}
+        self._series = {}  # name -> {labels: Counter | Histogram}
+        self._gauges = {}  # name -> callback returning {labels: value}
+        self._lock = threading.Lock()
+
+    def _declare(self, name, kind, help_text):
+        if self._types.setdefault(name, kind) != kind:
+            raise ValueError(f"Metric '{name}' is already registered as a {self._types[name]}.")
+        self._help.setdefault(name, help_text)
+
+    def _get_or_create(self, name, kind, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, kind, help_text)
+            series = self._series.setdefault(name, {})
+            if key not in series:
+                series[key] = factory()
+            return series[key]
+
+    def counter(self, name, help_text="", **labels):
+        return self._get_or_create(name, "counter", help_text, labels, Counter)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get_or_create(name, "histogram", help_text, labels, lambda: Histogram(buckets))
+
+    def attach_histogram(self, name, histogram, help_text="", **labels):
+        """Exports an existing ``Histogram`` under ``name`` with the given labels."""
+        self._get_or_create(name, "histogram", help_text, labels, lambda: histogram)
+
+    def gauge(self, name, callback, help_text=""):
+        """Registers a gauge read from ``callback()``, which returns ``{((label, value), ...): number}``."""
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._gauges[name] = callback
+
+    @contextmanager
+    def time(self, stage):
+        """Times the enclosed block into the ``stage_duration_seconds`` histogram for ``stage``."""
+        histogram = self.histogram(
+            "stage_duration_seconds", "Time spent in each request stage.", stage=stage
+        )
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def render(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            series = {name: dict(values) for name, values in self._series.items()}
+            gauges = dict(self._gauges)
+
+        lines = []
+        for name in sorted(set(series) | set(gauges)):
+            lines.append(f"# HELP {name} {self._help.get(name, '')}")
+            lines.append(f"# TYPE {name} {self._types[name]}")
+            if name in gauges:
+                for labels, value in sorted(gauges[name]().items()):
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {float(value)}")
+                continue
+
+            for labels, metric in sorted(series[name].items()):
+                if isinstance(metric, Counter):
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                    continue
+                snapshot = metric.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared collector for the whole server
+collector = MetricsCollector()
+
+
+def timed(stage):
+    """Shortcut for ``collector.time(stage)``; usable as a context manager or decorator."""
+    return collector.time(stage)
@@ -0,0 +1,152 @@
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies larger than ``max_body_bytes`` with 413.
+
+    The limit is checked against ``Content-Length`` up front and enforced again
+    while the body streams in, so an oversized upload is cut off as soon as it
+    crosses the limit instead of being buffered in full.
+    """
+
+    def __init__(self, app, max_body_bytes, paths=None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.paths = set(paths) if paths else None
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body too large. Limit is {self.max_body_bytes} bytes."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.paths is not None and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Stop reading; the app sees a disconnect and its response is replaced below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                if not started:
+                    started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(send)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts and times every HTTP request.
+
+    Requests are labelled by route template (``/validate/jobs/{job_id}``, not the
+    concrete path) so job IDs do not create new series. With ``profile_sample_rate``
+    above zero, that fraction of requests runs under cProfile and the stats are
+    dumped to ``profile_dir``, one ``.prof`` file per request. Only the event-loop
+    thread is profiled, so work handed to a pool shows up as time spent waiting.
+    """
+
+    def __init__(self, app, collector, profile_sample_rate=0.0, profile_dir="var/profiles"):
+        self.app = app
+        self.collector = collector
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_dir = profile_dir
+        # cProfile cannot profile overlapping requests on one thread, so one sample runs at a time
+        self._profiling = threading.Lock()
+
+    def _start_profile(self):
+        if self.profile_sample_rate <= 0 or random.random() >= self.profile_sample_rate:
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _finish_profile(self, profiler, method, route):
+        try:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{time.time():.3f}-{method}-{slug}.prof"))
+        finally:
+            self._profiling.release()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Reported if the app raises before responding
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = self._start_profile()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            # FastAPI records the matched route in the scope; anything else is grouped together
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.collector.counter(
+                "http_requests_total", "HTTP requests by route and status.",
+                method=method, route=route, status=str(status),
+            ).inc()
+            if status >= 500:
+                self.collector.counter(
+                    "http_request_errors_total", "HTTP requests that failed with a 5xx status.",
+                    method=method, route=route,
+                ).inc()
+            self.collector.histogram(
+                "http_request_duration_seconds", "HTTP request latency.", method=method, route=route,
+            ).observe(elapsed)
+            if profiler is not None:
+                self._finish_profile(profiler, method, route)
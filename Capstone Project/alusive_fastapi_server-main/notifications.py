@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+
+import resend
+
+from metrics import timed
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Resend accepts at most 100 emails per batch request
+RESEND_MAX_BATCH = 100
+
+
+class ResendTransport:
+    """Delivers emails through the Resend API."""
+
+    def send(self, message):
+        return resend.Emails.send(message)
+
+    def send_batch(self, messages):
+        return resend.Batch.send(messages)
+
+
+class FakeTransport:
+    """Records emails instead of sending them, for local testing."""
+
+    def __init__(self, failures=0):
+        self.failures = failures  # Number of upcoming calls that should fail
+        self.sent = []
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _deliver(self, messages):
+        with self._lock:
+            self.calls.append(list(messages))
+            if self.failures > 0:
+                self.failures -= 1
+                raise RuntimeError("Simulated transport failure.")
+            self.sent.extend(messages)
+
+    def send(self, message):
+        self._deliver([message])
+
+    def send_batch(self, messages):
+        self._deliver(messages)
+
+
+TRANSPORTS = {
+    "resend": ResendTransport,
+    "fake": FakeTransport,
+}
+
+
+class NotificationOutbox(SQLiteStore):
+    """
+    SQLite-backed queue of outgoing emails.
+
+    Messages stay on disk until they are delivered or give up, so they survive
+    restarts. Workers claim messages with a lease, which lets several processes
+    on one host share the same outbox. Sent and failed messages are kept for
+    ``retention`` seconds, and purged once every ``PURGE_EVERY`` new messages.
+    """
+
+    def __init__(self, path, lease_seconds=120, retention=7 * 86400):
+        self.lease_seconds = lease_seconds
+        self.retention = retention
+        super().__init__(path)
+
+    def _create_schema(self, conn):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                created_at REAL NOT NULL,
+                last_error TEXT,
+                dedup_key TEXT
+            )
+            """
+        )
+        # Outboxes created before duplicate suppression have no dedup_key column
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(outbox)")]
+        if "dedup_key" not in columns:
+            conn.execute("ALTER TABLE outbox ADD COLUMN dedup_key TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_dedup ON outbox (dedup_key, created_at)")
+
+    def enqueue(self, message, dedup_window=None):
+        """
+        Stores a message for delivery and returns its id. With ``dedup_window`` (seconds),
+        an identical message queued within that window is suppressed and ``None`` is returned.
+        """
+        now = time.time()
+        payload = json.dumps(message, sort_keys=True)
+        dedup_key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if dedup_window:
+                    duplicate = conn.execute(
+                        "SELECT 1 FROM outbox WHERE dedup_key = ? AND created_at >= ? AND status != 'failed' LIMIT 1",
+                        (dedup_key, now - dedup_window),
+                    ).fetchone()
+                    if duplicate:
+                        conn.execute("COMMIT")
+                        return None
+                cursor = conn.execute(
+                    "INSERT INTO outbox (payload, next_attempt_at, created_at, dedup_key) VALUES (?, ?, ?, ?)",
+                    (payload, now, now, dedup_key),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if self.retention is not None and self._purge_due():
+                conn.execute(
+                    "DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created_at < ?",
+                    (now - self.retention,),
+                )
+            return cursor.lastrowid
+
+    def claim(self, limit):
+        """Claims up to ``limit`` due messages, including ones whose lease has expired."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT id, payload, attempts FROM outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= ?)
+                       OR (status = 'sending' AND claimed_at <= ?)
+                    ORDER BY id LIMIT ?
+                    """,
+                    (now, now - self.lease_seconds, limit),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                    [(now, row[0]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [(row[0], json.loads(row[1]), row[2]) for row in rows]
+
+    def mark_sent(self, ids):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                [(message_id,) for message_id in ids],
+            )
+
+    def mark_failed(self, message_id, error, retry_at=None):
+        """Schedules a retry at ``retry_at``, or gives up for good when it is ``None``."""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ?,
+                                  claimed_at = NULL, last_error = ?
+                WHERE id = ?
+                """,
+                ("pending" if retry_at is not None else "failed", retry_at or time.time(), error, message_id),
+            )
+
+    def counts(self):
+        """Returns the number of messages in each status."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class NotificationDispatcher:
+    """
+    Background thread that drains a ``NotificationOutbox`` through a transport.
+
+    Several due messages are sent with one batch request; if the batch is rejected
+    they are sent one by one, so one bad message does not hold back the rest.
+    Failed deliveries are retried with exponential backoff until ``max_attempts``
+    is reached. Identical messages enqueued within ``dedup_window`` seconds are
+    only sent once.
+    """
+
+    def __init__(self, outbox, transport, batch_size=50, poll_interval=1.0,
+                 max_attempts=6, base_delay=2.0, max_delay=300.0, dedup_window=None):
+        self.outbox = outbox
+        self.dedup_window = dedup_window
+        self.transport = transport
+        self.batch_size = max(1, min(batch_size, RESEND_MAX_BATCH))
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def enqueue(self, message):
+        """
+        Persists a message and wakes the dispatcher; returns the message id, or ``None``
+        when an identical message was already queued within ``dedup_window`` seconds.
+        """
+        message_id = self.outbox.enqueue(message, self.dedup_window)
+        if message_id is not None:
+            self._wakeup.set()
+        return message_id
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                delivered = self.dispatch_once()
+            except Exception:
+                logger.exception("Notification dispatch failed")
+                delivered = 0
+            # Keep draining while there is work, otherwise wait for new messages
+            if not delivered:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def backoff(self, attempts):
+        """Delay before the next attempt, doubling per attempt with a little jitter."""
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    def dispatch_once(self):
+        """Sends one batch of due messages; returns how many were claimed."""
+        claimed = self.outbox.claim(self.batch_size)
+        if not claimed:
+            return 0
+
+        if len(claimed) > 1:
+            try:
+                with timed("email_send"):
+                    self.transport.send_batch([message for _, message, _ in claimed])
+            except Exception as e:
+                # A batch is rejected as a whole (e.g. for one invalid address), so send the
+                # messages one by one and only retry the ones that fail on their own
+                logger.warning("Batch of %s notifications failed, sending them one by one: %s", len(claimed), e)
+            else:
+                self.outbox.mark_sent([message_id for message_id, _, _ in claimed])
+                return len(claimed)
+
+        for message_id, message, attempts in claimed:
+            self._send_one(message_id, message, attempts)
+        return len(claimed)
+
+    def _send_one(self, message_id, message, attempts):
+        try:
+            with timed("email_send"):
+                self.transport.send(message)
+        except Exception as e:
+            attempts += 1
+            retry_at = None
+            if attempts < self.max_attempts:
+                retry_at = time.time() + self.backoff(attempts)
+            else:
+                logger.error("Giving up on notification %s after %s attempts: %s", message_id, attempts, e)
+            self.outbox.mark_failed(message_id, str(e), retry_at)
+        else:
+            self.outbox.mark_sent([message_id])
+
+    def stats(self):
+        return {"running": bool(self._thread and self._thread.is_alive()), "messages": self.outbox.counts()}
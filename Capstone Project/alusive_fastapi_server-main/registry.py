@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Loads models lazily, on first use or in a background warm-up.
+
+    Each model is registered with a zero-argument loader. ``get`` loads it once
+    (concurrent callers wait for the same load) and returns the cached instance.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._load_seconds = {}
+        self._errors = {}
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def names(self):
+        return list(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Returns the model, loading it first if needed."""
+        try:
+            return self._models[name]
+        except KeyError:
+            pass
+
+        with self._locks[name]:
+            if name not in self._models:
+                start = time.perf_counter()
+                try:
+                    model = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._load_seconds[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+                self._models[name] = model
+                logger.info("Loaded model '%s' in %.2fs", name, self._load_seconds[name])
+        return self._models[name]
+
+    def warm_up(self, names=None, background=True):
+        """Loads the given models (default: all), in a daemon thread unless ``background`` is False."""
+        names = list(names) if names is not None else self.names()
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    logger.exception("Failed to warm up model '%s'", name)
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        """Reports, per model, whether it is loaded, how long loading took and any load error."""
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+
+# Shared registry for every model the server uses
+models = ModelRegistry()
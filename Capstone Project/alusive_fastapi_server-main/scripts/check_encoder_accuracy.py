@@ -0,0 +1,96 @@
+"""
+Compares chatbot encoder backends against a reference backend on the FAQ set.
+
+For every FAQ question and a few rephrasings of it, each backend picks its best
+FAQ match the way /chat/ does. The report shows how often the best-match index
+agrees with the reference backend, the confidence deltas, and how often the
+0.6 answer threshold decision agrees.
+
+Usage (from the server directory):
+    python scripts/check_encoder_accuracy.py --backends onnx onnx-int8 torch-int8
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoders import ENCODER_BACKENDS, load_encoder  # noqa: E402
+from faq_index import load_faq_entries  # noqa: E402
+
+# Confidence above which /chat/ returns the FAQ answer
+ANSWER_THRESHOLD = 0.6
+
+
+def query_set(questions):
+    """The FAQ questions plus simple rephrasings, so the check is not only exact matches."""
+    queries = []
+    for question in questions:
+        bare = question.rstrip("?").strip()
+        queries += [
+            question,
+            bare.lower(),
+            f"Hi, can you tell me: {bare}?",
+        ]
+    return queries
+
+
+def best_matches(backend, model_name, questions, queries, batch_size):
+    model = load_encoder(model_name, backend)
+    faq_embeddings = model.encode(questions, batch_size=batch_size, normalize_embeddings=True)
+    query_embeddings = model.encode(queries, batch_size=batch_size, normalize_embeddings=True)
+    similarities = query_embeddings @ faq_embeddings.T
+    best = np.argmax(similarities, axis=1)
+    return best, similarities[np.arange(len(best)), best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--faqs", default="data/faqs.json")
+    parser.add_argument("--reference", default="torch", choices=ENCODER_BACKENDS)
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx", "onnx-int8"], choices=ENCODER_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Exit with status 1 if any backend agrees less often than this.")
+    parser.add_argument("--json", help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    questions = [entry["question"] for entry in load_faq_entries(args.faqs)]
+    queries = query_set(questions)
+    reference_best, reference_confidence = best_matches(args.reference, args.model, questions, queries, args.batch_size)
+
+    report = {"model": args.model, "reference": args.reference, "queries": len(queries), "backends": {}}
+    print(f"{len(queries)} queries against {len(questions)} FAQs, reference backend '{args.reference}'")
+    print(f"{'backend':<12} {'index agree':>12} {'threshold agree':>16} {'mean |dconf|':>13} {'max |dconf|':>12}")
+
+    passed = True
+    for backend in args.backends:
+        best, confidence = best_matches(backend, args.model, questions, queries, args.batch_size)
+        delta = np.abs(confidence - reference_confidence)
+        result = {
+            "index_agreement": float(np.mean(best == reference_best)),
+            "threshold_agreement": float(np.mean((confidence > ANSWER_THRESHOLD) == (reference_confidence > ANSWER_THRESHOLD))),
+            "mean_confidence_delta": float(delta.mean()),
+            "max_confidence_delta": float(delta.max()),
+            "disagreements": [
+                {"query": queries[i], "reference": questions[reference_best[i]], "backend": questions[best[i]]}
+                for i in np.flatnonzero(best != reference_best)
+            ],
+        }
+        report["backends"][backend] = result
+        passed &= result["index_agreement"] >= args.min_agreement
+        print(f"{backend:<12} {result['index_agreement']:>12.2%} {result['threshold_agreement']:>16.2%} "
+              f"{result['mean_confidence_delta']:>13.4f} {result['max_confidence_delta']:>12.4f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
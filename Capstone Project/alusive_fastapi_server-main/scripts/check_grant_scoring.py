@@ -0,0 +1,139 @@
+"""
+Checks that every grant scoring path gives the same answer as the original one.
+
+Random applicants, plus edge cases where a derived ratio divides by zero, are
+encoded by ``preprocess_input`` (the reference), the precompiled ``FeatureEncoder``
+(/predict-grant/) and ``build_feature_matrix`` (/predict-grant/batch/ and
+scripts/score_grants.py), and scored by the random forest and by ``FlatForest``
+(GRANT_SCORER=compiled). Features and probabilities must match the reference
+exactly, including rows with missing (NaN) features such as an income of zero
+over a household of zero. Rows with an infinite feature, which the model
+cannot score, must be rejected with ``NonFiniteFeatures`` on every path.
+
+Usage (from the server directory):
+    python scripts/check_grant_scoring.py --applicants 5000
+"""
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grant_scoring import FlatForest, NonFiniteFeatures, check_finite_features  # noqa: E402
+from registry import models  # noqa: E402
+from utils import build_feature_matrix, feature_encoder, preprocess_input  # noqa: E402
+
+
+def random_applicant(rng):
+    household_size = rng.randint(1, 10)
+    return {
+        "Academic Standing": rng.choice(["Yes", "No"]),
+        "Disciplinary Standing": rng.choice(["Yes", "No"]),
+        "Financial Standing": rng.choice(["Yes", "No"]),
+        "ALU Grant Status": rng.choice(["Yes", "No"]),
+        "Previous Alusive Grant Status": rng.choice(["Yes", "No", "Unknown"]),
+        "Fee balance (USD)": round(rng.uniform(0, 5000), 2),
+        "Total Monthly Income": rng.choice([0.0, round(rng.uniform(0, 2000), 2)]),
+        "Students in Household": rng.randint(1, 4),
+        "Household Size": household_size,
+        "Household Supporters": rng.randint(0, household_size),
+        "Household Dependants": rng.randint(0, household_size),
+        "ALU Grant Amount": round(rng.uniform(0, 3000), 2),
+        "Grant Requested": round(rng.uniform(100, 1500), 2),
+        "Amount Affordable": round(rng.uniform(0, 1000), 2),
+    }
+
+
+def edge_cases(rng):
+    """Applicants whose derived ratios divide by zero: ``(applicant, scorable)`` pairs."""
+    cases = []
+    for changes, scorable in [
+        ({"Total Monthly Income": 0.0, "Household Size": 0}, True),  # 0/0: NaN
+        ({"Household Supporters": -1, "Household Dependants": 0}, True),  # 0/0: NaN
+        ({"Amount Affordable": -1.0, "Grant Requested": 0.0}, True),  # 0/0: NaN
+        ({"Total Monthly Income": 0.0, "Household Size": 0, "Amount Affordable": -1.0, "Grant Requested": 0.0}, True),
+        ({"Total Monthly Income": 1500.0, "Household Size": 0}, False),  # x/0: inf
+        ({"Total Monthly Income": -1.0, "Fee balance (USD)": 100.0}, False),  # x/0: inf
+        ({"Household Supporters": -1, "Household Dependants": 3}, False),  # x/0: inf
+        ({"Fee balance (USD)": 1e300}, False),  # Beyond float32
+    ]:
+        for _ in range(5):
+            cases.append(({**random_applicant(rng), **changes}, scorable))
+    return cases
+
+
+def same(a, b):
+    """Exact equality, with NaN equal to NaN."""
+    return a.shape == b.shape and bool(np.all((a == b) | (np.isnan(a) & np.isnan(b))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applicants", type=int, default=2000, help="Random applicants besides the edge cases.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [(random_applicant(rng), True) for _ in range(args.applicants)] + edge_cases(rng)
+    applicants = [applicant for applicant, _ in cases]
+    scorable = np.array([ok for _, ok in cases])
+
+    forest = models.get("grant_model")
+    flat_forest = FlatForest(forest)
+    feature_columns = list(forest.feature_names_in_)
+    encoder = feature_encoder(tuple(feature_columns))
+    failures = []
+
+    # Reference: the original per-applicant DataFrame path, as the model sees it (float32)
+    reference_frames = [preprocess_input(dict(applicant), feature_columns) for applicant in applicants]
+    reference = np.vstack([frame.to_numpy(dtype=np.float64) for frame in reference_frames]).astype(np.float32)
+    encoded = np.vstack([encoder.encode(applicant).copy() for applicant in applicants])
+    matrix = build_feature_matrix(applicants, feature_columns).astype(np.float32)
+    if not same(encoded[scorable], reference[scorable]):
+        failures.append("FeatureEncoder features differ from preprocess_input")
+    if not same(matrix[scorable], reference[scorable]):
+        failures.append("build_feature_matrix features differ from preprocess_input")
+
+    # Scorable rows: the same probabilities from every scorer, NaN rows included
+    frame = pd.concat([reference_frames[i] for i in np.flatnonzero(scorable)])
+    expected = forest.predict_proba(frame)
+    for name, probabilities in [
+        ("forest on build_feature_matrix", forest.predict_proba(pd.DataFrame(matrix[scorable], columns=feature_columns))),
+        ("FlatForest on FeatureEncoder", flat_forest.predict_proba(encoded[scorable])),
+        ("FlatForest on build_feature_matrix", flat_forest.predict_proba(matrix[scorable])),
+    ]:
+        if not same(probabilities, expected):
+            rows = np.flatnonzero(~np.all(probabilities == expected, axis=1))
+            failures.append(f"{name}: probabilities differ from the forest on {len(rows)} rows, e.g. {rows[:5].tolist()}")
+
+    # Unscorable rows: rejected on every path, with the right rows named
+    unscorable = np.flatnonzero(~scorable)
+    for i in unscorable:
+        try:
+            check_finite_features(encoder.encode(applicants[i]), feature_columns)
+            failures.append(f"FeatureEncoder row {i} was not rejected")
+        except NonFiniteFeatures:
+            pass
+    try:
+        check_finite_features(build_feature_matrix(applicants, feature_columns), feature_columns)
+        failures.append("build_feature_matrix rows were not rejected")
+    except NonFiniteFeatures as e:
+        if e.rows != unscorable.tolist():
+            failures.append(f"build_feature_matrix rejected rows {e.rows}, expected {unscorable.tolist()}")
+
+    missing = int(np.isnan(reference[scorable]).any(axis=1).sum())
+    print(f"{len(applicants)} applicants: {int(scorable.sum())} scorable ({missing} with missing features), "
+          f"{len(unscorable)} unscorable")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("All scoring paths agree")
+
+
+if __name__ == "__main__":
+    main()
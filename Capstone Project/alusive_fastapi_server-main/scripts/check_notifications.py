@@ -0,0 +1,158 @@
+"""
+Checks the notification outbox and dispatcher against the fake transport.
+
+Each scenario queues emails in a fresh outbox and drives
+``NotificationDispatcher.dispatch_once`` by hand, with ``FakeTransport(failures=...)``
+failing the first calls:
+
+- a failed email is retried after an exponential backoff and then sent;
+- an email that keeps failing is given up after ``max_attempts``;
+- a rejected batch is sent one by one, and only the emails that fail on their own
+  are retried;
+- sent and failed emails past the retention are purged.
+
+Usage (from the server directory):
+    python scripts/check_notifications.py
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notifications import FakeTransport, NotificationDispatcher, NotificationOutbox  # noqa: E402
+
+
+def email(i):
+    return {"from": "check@example.com", "to": [f"applicant{i}@example.com"], "subject": "Check", "html": str(i)}
+
+
+def dispatcher(directory, name, failures, **kwargs):
+    outbox = NotificationOutbox(os.path.join(directory, f"{name}.sqlite3"))
+    return NotificationDispatcher(outbox, FakeTransport(failures=failures), **kwargs)
+
+
+def rows(outbox):
+    """Returns ``{id: (status, attempts, next_attempt_at)}`` for every message in the outbox."""
+    with sqlite3.connect(outbox.path) as conn:
+        return {row[0]: row[1:] for row in conn.execute("SELECT id, status, attempts, next_attempt_at FROM outbox")}
+
+
+def make_due(outbox):
+    """Skips the backoff, so the next dispatch retries every pending message."""
+    with sqlite3.connect(outbox.path) as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE status = 'pending'")
+
+
+def check_retry(directory, failures):
+    d = dispatcher(directory, "retry", failures=1, base_delay=10.0)
+    message_id = d.enqueue(email(0))
+    before = time.time()
+    d.dispatch_once()
+    status, attempts, next_attempt_at = rows(d.outbox)[message_id]
+    if (status, attempts) != ("pending", 1):
+        failures.append(f"retry: after one failure the email is {status} with {attempts} attempts")
+    # base_delay * 2 ** 0, with up to 20% jitter
+    if not 8.0 <= next_attempt_at - before <= 12.5:
+        failures.append(f"retry: first retry scheduled {next_attempt_at - before:.1f} s out, expected about 10")
+    if d.dispatch_once():
+        failures.append("retry: the email was retried before its backoff")
+
+    make_due(d.outbox)
+    d.dispatch_once()
+    status, attempts, _ = rows(d.outbox)[message_id]
+    if (status, attempts, len(d.transport.sent)) != ("sent", 2, 1):
+        failures.append(f"retry: after the retry the email is {status} with {attempts} attempts")
+
+
+def check_backoff(failures):
+    d = NotificationDispatcher(None, FakeTransport(), base_delay=2.0, max_delay=300.0)
+    for attempts, expected in [(1, 2.0), (2, 4.0), (3, 8.0), (6, 64.0), (12, 300.0)]:
+        delays = [d.backoff(attempts) for _ in range(200)]
+        if not (0.8 * expected <= min(delays) and max(delays) <= 1.2 * expected):
+            failures.append(f"backoff: attempt {attempts} waits {min(delays):.1f}-{max(delays):.1f} s, "
+                            f"expected {expected:.0f} s +/- 20%")
+
+
+def check_give_up(directory, failures):
+    d = dispatcher(directory, "give_up", failures=100, max_attempts=3)
+    message_id = d.enqueue(email(0))
+    for _ in range(5):
+        d.dispatch_once()
+        make_due(d.outbox)
+    status, attempts, _ = rows(d.outbox)[message_id]
+    if (status, attempts, len(d.transport.calls)) != ("failed", 3, 3):
+        failures.append(f"give up: email is {status} after {attempts} attempts and {len(d.transport.calls)} calls, "
+                        f"expected failed after 3")
+
+
+def check_batch_fallback(directory, failures):
+    # The batch call and the first single send fail: four emails go out, one is retried
+    d = dispatcher(directory, "batch", failures=2, batch_size=10)
+    ids = [d.enqueue(email(i)) for i in range(5)]
+    if d.dispatch_once() != 5:
+        failures.append("batch: the five emails were not claimed together")
+    sizes = [len(call) for call in d.transport.calls]
+    if sizes != [5, 1, 1, 1, 1, 1]:
+        failures.append(f"batch: transport calls of sizes {sizes}, expected one batch of 5 then 5 single sends")
+    statuses = [rows(d.outbox)[message_id][0] for message_id in ids]
+    if statuses != ["pending"] + ["sent"] * 4:
+        failures.append(f"batch: statuses after the fallback are {statuses}")
+
+    make_due(d.outbox)
+    d.dispatch_once()
+    if [rows(d.outbox)[message_id][0] for message_id in ids] != ["sent"] * 5:
+        failures.append("batch: the email that failed on its own was not retried")
+
+    # A batch that goes through is one call
+    d = dispatcher(directory, "batch_ok", failures=0, batch_size=10)
+    for i in range(5):
+        d.enqueue(email(i))
+    d.dispatch_once()
+    if [len(call) for call in d.transport.calls] != [5]:
+        failures.append("batch: a successful batch was not sent as one call")
+
+
+def check_retention(directory, failures):
+    outbox = NotificationOutbox(os.path.join(directory, "retention.sqlite3"), retention=60)
+    d = NotificationDispatcher(outbox, FakeTransport(failures=2), max_attempts=1)
+    old = [d.enqueue(email(i)) for i in range(2)]
+    d.dispatch_once()  # The batch fails, then one email is given up on and the other sent
+    with sqlite3.connect(outbox.path) as conn:
+        conn.execute("UPDATE outbox SET created_at = created_at - 3600")
+    pending = d.enqueue(email(2))
+    with sqlite3.connect(outbox.path) as conn:
+        conn.execute("UPDATE outbox SET created_at = created_at - 3600 WHERE id = ?", (pending,))
+    for i in range(outbox.PURGE_EVERY):
+        d.enqueue(email(i + 3))
+    remaining = rows(outbox)
+    if any(message_id in remaining for message_id in old):
+        failures.append("retention: sent or failed emails past the retention were not purged")
+    if pending not in remaining:
+        failures.append("retention: an undelivered email was purged")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        check_retry(directory, failures)
+        check_backoff(failures)
+        check_give_up(directory, failures)
+        check_batch_fallback(directory, failures)
+        check_retention(directory, failures)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("Retries, backoff, batch fallback and retention behave as expected")
+
+
+if __name__ == "__main__":
+    main()
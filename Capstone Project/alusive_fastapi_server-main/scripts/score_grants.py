@@ -0,0 +1,202 @@
+"""
+Scores a whole grant cohort from a CSV or Parquet file.
+
+The input has one applicant per row, with the same column names /predict-grant/
+takes (e.g. "Fee balance (USD)", "Academic Standing"). It is read in chunks, each
+chunk is scored by the grant model in a pool of worker processes (GRANT_SCORER
+applies, as in the server), and every row's input columns are written to the output
+followed by predicted_category, one probability_<class> column per class and
+grant_message. Rows the model cannot score (infinite features, e.g. an income over
+a household of zero) get an empty prediction and an error message instead. Chunks
+are written in input order as they finish, and only a few are held at a time, so
+memory stays flat however large the file is. The throughput is reported at the end.
+
+Parquet files need pyarrow (pip install pyarrow). The output format follows the
+output file's extension.
+
+Usage (from the server directory):
+    python scripts/score_grants.py cohort.csv scores.csv
+    python scripts/score_grants.py cohort.parquet scores.parquet --chunk-size 100000 --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grant_scoring import NonFiniteFeatures  # noqa: E402
+from registry import models  # noqa: E402
+from utils import (  # noqa: E402
+    CATEGORICAL_FEATURES, GRANT_MESSAGES, NUMERIC_FEATURES, build_feature_matrix, score_grant_features,
+)
+
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise SystemExit(f"Unsupported file '{path}'. Must end in {', '.join(FORMATS)}.")
+    return FORMATS[extension]
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Parquet files need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def read_chunks(path, chunk_size):
+    """Yields the input file as DataFrames of at most ``chunk_size`` rows."""
+    if file_format(path) == "csv":
+        # Categorical answers stay strings, as they arrive at /predict-grant/
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype={name: str for name in CATEGORICAL_FEATURES})
+        return
+    pyarrow = import_pyarrow()
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """
+    Appends scored chunks to a CSV or Parquet file. CSV chunks arrive already
+    formatted, as ``(header, rows)`` text, so the workers do the formatting.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        self._file = None
+        self._parquet = None
+
+    def write(self, chunk):
+        if self.format == "csv":
+            header, rows = chunk
+            if self._file is None:
+                self._file = open(self.path, "w", newline="", encoding="utf-8")
+                self._file.write(header)
+            self._file.write(rows)
+            return
+
+        pyarrow = import_pyarrow()
+        if self._parquet is None:
+            table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+            self._parquet = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            # Later chunks take the first chunk's column types
+            table = pyarrow.Table.from_pandas(chunk, schema=self._parquet.schema, preserve_index=False)
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def load_scorer():
+    """Loads the grant model (and the flattened forest, if that is the scorer) in this process."""
+    model = models.get("grant_model")
+    if "grant_forest" in models.names():
+        models.get("grant_forest")
+    return model
+
+
+def score_chunk(chunk, feature_columns, predictions_only, output_format):
+    """
+    Returns the chunk's prediction columns, after its input columns unless ``predictions_only``,
+    as a DataFrame, or for CSV output as ``(header, rows)`` text.
+    """
+    features = build_feature_matrix(chunk, feature_columns)
+    classes = models.get("grant_model").classes_
+    scored = np.ones(len(chunk), dtype=bool)
+    try:
+        categories, probabilities = score_grant_features(features, feature_columns)
+    except NonFiniteFeatures as e:
+        # Rows the model cannot score are written without a prediction; the rest are scored
+        scored[e.rows] = False
+        categories = np.zeros(len(chunk), dtype=classes.dtype)
+        probabilities = np.full((len(chunk), len(classes)), np.nan)
+        if scored.any():
+            categories[scored], probabilities[scored] = score_grant_features(features[scored], feature_columns)
+
+    scores = pd.DataFrame({"predicted_category": pd.array(categories, dtype="Int64")}, index=chunk.index)
+    scores["predicted_category"] = scores["predicted_category"].where(scored)
+    for i, label in enumerate(classes):
+        scores[f"probability_{label}"] = probabilities[:, i]
+    messages = scores["predicted_category"].map(GRANT_MESSAGES).fillna("Error: Invalid category predicted.")
+    scores["grant_message"] = np.where(scored, messages, "Error: Features are infinite or too large to score.")
+    if not predictions_only:
+        # Re-scoring a scored file replaces its previous predictions
+        scores = pd.concat([chunk.drop(columns=scores.columns, errors="ignore"), scores], axis=1)
+    if output_format == "csv":
+        return scores.iloc[:0].to_csv(index=False, lineterminator="\n"), \
+            scores.to_csv(index=False, header=False, lineterminator="\n")
+    return scores
+
+
+def check_columns(chunk):
+    missing = [name for name in NUMERIC_FEATURES + CATEGORICAL_FEATURES if name not in chunk.columns]
+    if missing:
+        raise SystemExit(f"Input is missing the applicant columns: {', '.join(missing)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or Parquet file of applicants.")
+    parser.add_argument("output", help="CSV or Parquet file to write the scores to.")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows read and scored at a time.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Scoring processes; 1 scores in this process (default: CPU count).")
+    parser.add_argument("--predictions-only", action="store_true",
+                        help="Write only the prediction columns, not the input columns.")
+    args = parser.parse_args()
+
+    output_format = file_format(args.output)
+    if "parquet" in (file_format(args.input), output_format):
+        import_pyarrow()
+    feature_columns = list(load_scorer().feature_names_in_)
+
+    start = time.perf_counter()
+    rows = 0
+    writer = ChunkWriter(args.output)
+    chunks = read_chunks(args.input, args.chunk_size)
+    try:
+        if args.workers <= 1:
+            for chunk in chunks:
+                check_columns(chunk)
+                writer.write(score_chunk(chunk, feature_columns, args.predictions_only, output_format))
+                rows += len(chunk)
+        else:
+            # Chunks go to the workers and are written back in input order; at most two per
+            # worker are in flight, so a large file is never held in memory
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=load_scorer) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    check_columns(chunk)
+                    pending.append(pool.submit(
+                        score_chunk, chunk, feature_columns, args.predictions_only, output_format
+                    ))
+                    rows += len(chunk)
+                    if len(pending) >= 2 * args.workers:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.1f} s ({rows / elapsed if elapsed else 0:.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Converts the document validator to TFLite and reports its parity with the Keras model.
+
+Optionally converts models/document_validator.h5 to TFLite first (with post-training
+int8 quantization calibrated on sample documents). Then every document in
+--documents is scored by both models on the same preprocessed last page, and the
+report shows the signed/unsigned agreement rate at the threshold, the signed
+probability deltas, per-page latency, and every document whose decision flips.
+
+Usage (from the server directory):
+    python scripts/tflite_parity_report.py --convert --int8 --calibration samples/ --documents samples/
+    DOCUMENT_MODEL_BACKEND=tflite uvicorn main:app
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_backends import convert_to_tflite, load_document_backend  # noqa: E402
+from utils import (  # noqa: E402
+    DOCUMENT_MODEL_PATHS, SIGNED_THRESHOLD, is_pdf, pdf_page_info, preprocess_image, render_pdf_pages,
+)
+
+DOCUMENT_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+
+
+def document_paths(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(DOCUMENT_EXTENSIONS)
+    )
+
+
+def last_page_batch(path):
+    """Preprocesses a document's last page exactly as /validate/ does; returns a (1, 224, 224, 3) array."""
+    if is_pdf(path):
+        page_count, dpi, _ = pdf_page_info(path)
+        images, _ = render_pdf_pages(path, page_count, page_count, dpi)
+        return preprocess_image(images[-1])
+    return preprocess_image(path)
+
+
+def timed_predict(backend, batch):
+    start = time.perf_counter()
+    probability = float(backend.predict(batch)[0])
+    return probability, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", required=True, help="Directory of PDFs/images to compare the models on.")
+    parser.add_argument("--keras", default=DOCUMENT_MODEL_PATHS["keras"])
+    parser.add_argument("--tflite", default=DOCUMENT_MODEL_PATHS["tflite"], help="Default: DOCUMENT_TFLITE_PATH.")
+    parser.add_argument("--convert", action="store_true", help="Convert the Keras model to --tflite first.")
+    parser.add_argument("--int8", action="store_true", help="Quantize to int8 when converting.")
+    parser.add_argument("--calibration", help="Directory of sample documents for int8 calibration (default: --documents).")
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=SIGNED_THRESHOLD)
+    parser.add_argument("--json", help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    if args.convert or not os.path.exists(args.tflite):
+        calibration = None
+        if args.int8:
+            paths = document_paths(args.calibration or args.documents)[:args.calibration_limit]
+            print(f"Calibrating int8 quantization on {len(paths)} documents")
+            calibration = [last_page_batch(path) for path in paths]
+        convert_to_tflite(args.keras, args.tflite, int8=args.int8, calibration_batches=calibration)
+        print(f"Wrote {args.tflite} ({os.path.getsize(args.tflite) / 2 ** 20:.1f} MiB)")
+
+    keras_backend = load_document_backend("keras", args.keras)
+    tflite_backend = load_document_backend("tflite", args.tflite)
+
+    rows = []
+    for path in document_paths(args.documents):
+        batch = last_page_batch(path)
+        keras_probability, keras_ms = timed_predict(keras_backend, batch)
+        tflite_probability, tflite_ms = timed_predict(tflite_backend, batch)
+        rows.append({
+            "document": os.path.basename(path),
+            "keras_probability": keras_probability,
+            "tflite_probability": tflite_probability,
+            "delta": tflite_probability - keras_probability,
+            "agrees": (keras_probability > args.threshold) == (tflite_probability > args.threshold),
+            "keras_ms": keras_ms,
+            "tflite_ms": tflite_ms,
+        })
+    if not rows:
+        sys.exit(f"No documents found in {args.documents}")
+
+    deltas = np.abs([row["delta"] for row in rows])
+    report = {
+        "keras_model": args.keras,
+        "tflite_model": args.tflite,
+        "tflite_size_bytes": os.path.getsize(args.tflite),
+        "threshold": args.threshold,
+        "documents": len(rows),
+        "agreement_rate": float(np.mean([row["agrees"] for row in rows])),
+        "mean_abs_delta": float(deltas.mean()),
+        "p99_abs_delta": float(np.percentile(deltas, 99)),
+        "max_abs_delta": float(deltas.max()),
+        # The first call of each backend includes warm-up, so it is left out of the latency
+        "keras_median_ms": float(np.median([row["keras_ms"] for row in rows[1:]] or [rows[0]["keras_ms"]])),
+        "tflite_median_ms": float(np.median([row["tflite_ms"] for row in rows[1:]] or [rows[0]["tflite_ms"]])),
+        "disagreements": [row for row in rows if not row["agrees"]],
+        "rows": rows,
+    }
+
+    print(f"Documents:          {report['documents']}")
+    print(f"Agreement @ {args.threshold:.2f}:   {report['agreement_rate']:.2%}")
+    print(f"|delta| mean/p99/max: {report['mean_abs_delta']:.4f} / {report['p99_abs_delta']:.4f} / {report['max_abs_delta']:.4f}")
+    print(f"Median ms per page: keras {report['keras_median_ms']:.1f}, tflite {report['tflite_median_ms']:.1f}")
+    for row in report["disagreements"]:
+        print(f"  flips: {row['document']} keras={row['keras_probability']:.3f} tflite={row['tflite_probability']:.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
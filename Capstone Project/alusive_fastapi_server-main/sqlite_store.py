@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteStore:
+    """
+    Base of the stores kept in a local SQLite file and shared by every worker on the host
+    (the validation cache, the job store and the notification outbox).
+
+    The file's directory is created if needed and the database is put in WAL mode, so
+    readers do not block the writer. Subclasses create their tables in ``_create_schema``
+    and purge stale rows when ``_purge_due`` says so.
+    """
+
+    # Stale rows are purged once every this many writes
+    PURGE_EVERY = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._create_schema(conn)
+
+    def _create_schema(self, conn):
+        raise NotImplementedError
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)  # Autocommit
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _purge_due(self):
+        """Counts a write; true once every ``PURGE_EVERY`` writes."""
+        with self._lock:
+            self._writes += 1
+            return self._writes % self.PURGE_EVERY == 0
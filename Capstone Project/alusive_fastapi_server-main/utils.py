@@ -1,77 +1,274 @@
-import os
+import hashlib
+import io
+import math
 import tempfile
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 import numpy as np
 from PIL import Image
-from pdf2image import convert_from_path
-import tensorflow as tf
+from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes, pdfinfo_from_path
 import resend
 import joblib
 import pandas as pd
-from sklearn.preprocessing import OneHotEncoder
 from decouple import config
+from batching import MicroBatcher
+from registry import models
+from metrics import timed
+from document_backends import KERAS_MODEL_PATH, TFLITE_MODEL_PATH, load_document_backend
+from grant_scoring import FeatureEncoder, FlatForest, check_finite_features
 
-# Load the trained model for grant prediction
+# Load the trained model for grant prediction (on first use)
 GRANT_MODEL_PATH = "models/rf_grant_model.pkl"
-rf_clf = joblib.load(GRANT_MODEL_PATH)
+models.register("grant_model", lambda: joblib.load(GRANT_MODEL_PATH))
+# Grant scorer: "sklearn" (the forest's own predict_proba) or "compiled" (the forest flattened
+# into NumPy arrays by grant_scoring.FlatForest; same probabilities, much less overhead per call)
+GRANT_SCORER = config("GRANT_SCORER", default="sklearn")
+if GRANT_SCORER == "compiled":
+    models.register("grant_forest", lambda: FlatForest(models.get("grant_model")))
+elif GRANT_SCORER != "sklearn":
+    raise ValueError(f"Unknown GRANT_SCORER '{GRANT_SCORER}'. Must be 'sklearn' or 'compiled'.")
+
+# Load the trained model for document validation, with the "keras" or "tflite" backend
+DOCUMENT_MODEL_BACKEND = config("DOCUMENT_MODEL_BACKEND", default="keras")
+DOCUMENT_MODEL_PATHS = {
+    "keras": KERAS_MODEL_PATH,
+    "tflite": config("DOCUMENT_TFLITE_PATH", default=TFLITE_MODEL_PATH),
+}
+DOCUMENT_TFLITE_THREADS = config("DOCUMENT_TFLITE_THREADS", default=None, cast=lambda v: int(v) if v else None)
 
-# Load the trained model for document validation
-DOCUMENT_MODEL_PATH = "models/document_validator.h5"
 
+# Input size of the document validation model
+MODEL_INPUT_SIZE = (224, 224)
+
+# PDF pages are rendered at this multiple of the model input before the final resize
+PDF_RENDER_OVERSAMPLE = config("PDF_RENDER_OVERSAMPLE", default=2.0, cast=float)
+DEFAULT_PDF_DPI = 72
+
+
+def pdf_render_dpi(page_size, target_size=MODEL_INPUT_SIZE, oversample=PDF_RENDER_OVERSAMPLE):
+    """
+    DPI at which both sides of a page cover the model input (times ``oversample``).
+    ``page_size`` is pdfinfo's "Page size" field, e.g. "612 x 792 pts (letter)".
+    """
+    try:
+        width, height = (float(side) for side in page_size.split("pts")[0].split("x"))
+    except (AttributeError, ValueError):
+        return DEFAULT_PDF_DPI
+    return max(1, math.ceil(72.0 * max(target_size) * oversample / min(width, height)))
+
+
+def is_pdf(source, filename=None):
+    """Detects PDFs by their magic bytes, falling back to the file name."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        header = bytes(source[:5])
+    elif hasattr(source, "read"):
+        position = source.tell()
+        header = source.read(5)
+        source.seek(position)
+    else:
+        header = b""
+        filename = filename or str(source)
+    return header == b"%PDF-" or str(filename or "").lower().endswith(".pdf")
+
+
+def _pdf_source(source):
+    """Returns the PDF as a path or bytes, with the matching pdfinfo and convert functions."""
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source), pdfinfo_from_bytes, convert_from_bytes
+    return source, pdfinfo_from_path, convert_from_path
+
+
+@contextmanager
+def _pdf_file(source):
+    """
+    Yields a path to the PDF. Bytes are written to one temporary file for the whole
+    validation: poppler reads files, and pdf2image would otherwise write its own
+    temporary copy of the document for every pdfinfo and render call.
+    """
+    source, _, _ = _pdf_source(source)
+    if not isinstance(source, bytes):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        f.write(source)
+        f.flush()
+        yield f.name
+
+
+def pdf_page_info(source):
+    """Reads the page count and render DPI of a PDF without rasterizing it."""
+    source, pdfinfo, _ = _pdf_source(source)
+    start = time.perf_counter()
+    with timed("pdf_page_count"):
+        info = pdfinfo(source)
+    page_count_ms = (time.perf_counter() - start) * 1000
+    return int(info["Pages"]), pdf_render_dpi(info.get("Page size")), page_count_ms
+
+
+def render_pdf_pages(source, first_page, last_page, dpi):
+    """Rasterizes a range of PDF pages straight to memory. Returns the images and render time."""
+    source, _, convert = _pdf_source(source)
+    start = time.perf_counter()
+    with timed("pdf_render"):
+        images = convert(source, dpi=dpi, first_page=first_page, last_page=last_page)
+    return images, (time.perf_counter() - start) * 1000
 
-class DocumentValidator:
-    def __init__(self, model_path=DOCUMENT_MODEL_PATH):
-        self.model = tf.keras.models.load_model(model_path)
-        self.classes = ["unsigned", "signed"]
 
-    def validate_document(self, file_path):
-        with tempfile.TemporaryDirectory() as temp_dir:
-            if file_path.lower().endswith(".pdf"):
-                images = convert_from_path(file_path, output_folder=temp_dir)
-                image_paths = [os.path.join(temp_dir, f) for f in os.listdir(temp_dir)]
-            else:
-                image_paths = [file_path]
+# Probability above which a page counts as signed
+SIGNED_THRESHOLD = 0.75
 
-            last_page_path = image_paths[-1]
-            processed_img = preprocess_image(last_page_path)
-            pred = self.model.predict(processed_img, verbose=0)[0][0]
+# Pages rendered and scored per model call when scanning several pages
+SIGNATURE_SCAN_BATCH = config("SIGNATURE_SCAN_BATCH", default=4, cast=int)
 
-        is_signed = pred > 0.75
+
+# Micro-batching of concurrent document model calls
+DOCUMENT_BATCHING = config("DOCUMENT_BATCHING", default=True, cast=bool)
+DOCUMENT_BATCH_MAX_SIZE = config("DOCUMENT_BATCH_MAX_SIZE", default=16, cast=int)
+DOCUMENT_BATCH_MAX_WAIT_MS = config("DOCUMENT_BATCH_MAX_WAIT_MS", default=10.0, cast=float)
+
+
+class DocumentValidator:
+    def __init__(self, model_path=None, batching=DOCUMENT_BATCHING, backend=DOCUMENT_MODEL_BACKEND):
+        # TensorFlow (or the TFLite runtime) is only imported by workers that validate documents
+        self.backend = load_document_backend(
+            backend, model_path or DOCUMENT_MODEL_PATHS[backend], num_threads=DOCUMENT_TFLITE_THREADS
+        )
+        self.classes = ["unsigned", "signed"]
+        # Preprocessed pages from concurrent requests share one forward pass
+        self.scheduler = None
+        if batching:
+            self.scheduler = MicroBatcher(
+                self._predict_batch,
+                max_batch_size=DOCUMENT_BATCH_MAX_SIZE,
+                max_wait_ms=DOCUMENT_BATCH_MAX_WAIT_MS,
+                name="document-batcher",
+            )
+
+    def _predict_batch(self, images):
+        """Runs the model once over a list of preprocessed 224x224 images."""
+        with timed("document_predict"):
+            return self.backend.predict(np.stack(images))
+
+    def predict_pages(self, pages):
+        """Scores several pages with a single model call; returns their signed probabilities."""
+        batch = np.concatenate([preprocess_image(page) for page in pages])
+        if self.scheduler is None:
+            return self._predict_batch(list(batch))
+        return np.asarray(self.scheduler(list(batch)))
+
+    def _scan_pdf(self, path, scan_pages, early_exit, timings):
+        """Scores the last ``scan_pages`` pages of a PDF file; returns the ``(page, probability)`` scores and page count."""
+        page_count, dpi, timings["page_count_ms"] = pdf_page_info(path)
+        timings["dpi"] = dpi
+
+        first_page = 1 if scan_pages <= 0 else max(1, page_count - scan_pages + 1)
+        chunk_size = max(1, SIGNATURE_SCAN_BATCH)
+
+        scores = []
+        last_page = page_count
+        while last_page >= first_page:
+            chunk_first = max(first_page, last_page - chunk_size + 1)
+            images, render_ms = render_pdf_pages(path, chunk_first, last_page, dpi)
+            timings["render_ms"] += render_ms
+
+            probabilities = self.predict_pages(images)
+            scores = list(zip(range(chunk_first, last_page + 1), probabilities)) + scores
+            if early_exit and max(probabilities) > SIGNED_THRESHOLD:
+                break
+            last_page = chunk_first - 1
+        return scores, page_count
+
+    def validate_document(self, source, filename=None, scan_pages=1, early_exit=False):
+        """
+        Validates a document given as a file path, bytes, or a binary file-like object.
+
+        The last ``scan_pages`` pages of a PDF are checked (0 checks every page) and the
+        document counts as signed if any of them is. Pages are rendered and scored
+        ``SIGNATURE_SCAN_BATCH`` at a time from the end of the document, so only that many
+        page images are held at once however long the PDF is; with ``early_exit`` the scan
+        stops at the first signed page. A PDF given as bytes is written to disk once, for
+        the page count and every render.
+        """
+        timings = {"page_count_ms": 0.0, "render_ms": 0.0}
+
+        if is_pdf(source, filename):
+            with _pdf_file(source) as path:
+                scores, page_count = self._scan_pdf(path, scan_pages, early_exit, timings)
+        else:
+            page_count = 1
+            scores = [(1, self.predict_pages([source])[0])]
+
+        # The most confident page decides; by default that is the last page
+        best_page, pred = max(reversed(scores), key=lambda score: score[1])
+        is_signed = pred > SIGNED_THRESHOLD
         return {
             "prediction": self.classes[int(is_signed)],
             "signed_probability": float(pred),
             "last_page_analysis": {
-                "page": len(image_paths),
+                "page": int(best_page),
                 "signed": bool(is_signed),
                 "confidence": float(pred),
+                "page_count": page_count,
+                "pages": [
+                    {
+                        "page": int(page),
+                        "signed": bool(probability > SIGNED_THRESHOLD),
+                        "signed_probability": float(probability),
+                    }
+                    for page, probability in scores
+                ],
             },
+            "timings": timings,
         }
 
 
-def preprocess_image(img_path, target_size=(224, 224)):
-    """Preprocesses image for document validation model."""
-    img = Image.open(img_path)
+# ImageNet channel means subtracted by ResNet50 preprocessing, in BGR order
+RESNET50_BGR_MEAN = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+
+@timed("preprocess_image")
+def preprocess_image(img, target_size=MODEL_INPUT_SIZE):
+    """Preprocesses an image (path, bytes, buffer or PIL image) for document validation model."""
+    if isinstance(img, (bytes, bytearray, memoryview)):
+        img = Image.open(io.BytesIO(img))
+    elif not isinstance(img, Image.Image):
+        img = Image.open(img)
     img = img.convert("RGB").resize(target_size)
-    img_array = tf.keras.preprocessing.image.img_to_array(img)
-    img_array = tf.keras.applications.resnet50.preprocess_input(img_array)
+    img_array = np.asarray(img, dtype=np.float32)
+    # Same as tf.keras.applications.resnet50.preprocess_input ("caffe" mode), without TensorFlow
+    img_array = img_array[..., ::-1] - RESNET50_BGR_MEAN
     return np.expand_dims(img_array, axis=0)
 
 
-# Initialize document validator
-validator = DocumentValidator()
+@lru_cache(maxsize=None)
+def document_model_version(backend=DOCUMENT_MODEL_BACKEND):
+    """Backend name plus a content hash of its model file, without loading the model."""
+    digest = hashlib.sha256()
+    with open(DOCUMENT_MODEL_PATHS[backend], "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f"{backend}-{digest.hexdigest()[:16]}"
 
 
-def validate_document(file_path):
-    """Validate the document and return the analysis result."""
-    return validator.validate_document(file_path)
+# Initialize document validator (on first use)
+models.register("document_validator", DocumentValidator)
+
+
+def validate_document(source, filename=None, scan_pages=1, early_exit=False):
+    """Validate the document (path, bytes or buffer) and return the analysis result."""
+    return models.get("document_validator").validate_document(source, filename, scan_pages, early_exit)
 
 
 # Send emails using Resend API
 resend.api_key = config("RESEND_API_KEY")
 
 
-def send_email(to_email, body):
-    """Send an email using the Resend API."""
-    params = {
+def build_email_params(to_email, body):
+    """Builds the Resend API parameters for a document status email."""
+    return {
         # Use "from" instead of "from_"
         "from": "Alusive <alusiveafrica_rwa@alusiveafrica.org>",
         "to": [to_email, 'alusiveafrica_rwa@alustudent.com'],
@@ -79,7 +276,11 @@ def send_email(to_email, body):
         "html": body,
     }
 
-    email = resend.Emails.send(params)
+
+def send_email(to_email, body):
+    """Send an email using the Resend API."""
+    with timed("email_send"):
+        email = resend.Emails.send(build_email_params(to_email, body))
     return email
 
 
@@ -100,6 +301,14 @@ def compute_features(df):
     return df
 
 
+# Raw applicant fields, as sent by the /predict-grant/ endpoints
+CATEGORICAL_FEATURES = ["Academic Standing", "Disciplinary Standing", "Financial Standing",
+                        "ALU Grant Status", "Previous Alusive Grant Status"]
+NUMERIC_FEATURES = ["Fee balance (USD)", "Total Monthly Income", "Students in Household",
+                    "Household Size", "Household Supporters", "Household Dependants",
+                    "ALU Grant Amount", "Grant Requested", "Amount Affordable"]
+
+
 def preprocess_input(data: dict, feature_columns: list):
     """
     Preprocess input data into a DataFrame, ensuring one-hot encoding and feature alignment.
@@ -110,9 +319,7 @@ def preprocess_input(data: dict, feature_columns: list):
     df = compute_features(df)
 
     # One-hot encode categorical features
-    categorical_features = ["Academic Standing", "Disciplinary Standing", "Financial Standing",
-                            "ALU Grant Status", "Previous Alusive Grant Status"]
-    df_encoded = pd.get_dummies(df, columns=categorical_features)
+    df_encoded = pd.get_dummies(df, columns=CATEGORICAL_FEATURES)
 
     # Add missing columns that were in training data
     missing_cols = set(feature_columns) - set(df_encoded.columns)
@@ -125,19 +332,119 @@ def preprocess_input(data: dict, feature_columns: list):
     return df_encoded
 
 
+@lru_cache(maxsize=8)
+def feature_encoder(feature_columns: tuple):
+    """Precompiled single-applicant encoder for the given model columns, built once."""
+    return FeatureEncoder(feature_columns, NUMERIC_FEATURES, _one_hot_mapping(feature_columns))
+
+
+def score_grant_features(features, feature_columns: list):
+    """
+    Runs the grant model over a feature matrix with the configured scorer.
+    Returns the predicted categories and class probabilities from a single forest pass.
+    Raises ``NonFiniteFeatures`` for rows with infinite features instead of scoring any.
+    """
+    check_finite_features(features, feature_columns)
+    if GRANT_SCORER == "compiled":
+        return models.get("grant_forest").predict_with_proba(features)
+
+    rf_clf = models.get("grant_model")
+    # predict() is argmax over predict_proba(), so one call gives both
+    predicted_probabilities = rf_clf.predict_proba(pd.DataFrame(features, columns=feature_columns))
+    return rf_clf.classes_[np.argmax(predicted_probabilities, axis=1)], predicted_probabilities
+
+
 def predict_grant_category(applicant_data: dict, feature_columns: list):
     """
     Predicts grant category based on applicant data.
     Returns predicted category, class probabilities, and grant message.
     """
-    processed_data = preprocess_input(applicant_data, feature_columns)
+    with timed("grant_preprocess"):
+        features = feature_encoder(tuple(feature_columns)).encode(applicant_data)
 
     # Model prediction
-    predicted_category = rf_clf.predict(processed_data)[0]
-    predicted_probabilities = rf_clf.predict_proba(processed_data)[0]
+    with timed("grant_predict_proba"):
+        predicted_categories, predicted_probabilities = score_grant_features(features, feature_columns)
+    predicted_category = int(predicted_categories[0])
 
     return {
-        "predicted_category": int(predicted_category),
-        "probabilities": predicted_probabilities.tolist(),
+        "predicted_category": predicted_category,
+        "probabilities": predicted_probabilities[0].tolist(),
         "grant_message": GRANT_MESSAGES.get(predicted_category, "Error: Invalid category predicted.")
     }
+
+
+@lru_cache(maxsize=8)
+def _one_hot_mapping(feature_columns: tuple):
+    """
+    Fixed one-hot mapping equivalent to ``pd.get_dummies`` followed by column alignment.
+    Returns ``(column_index, categorical_feature, value)`` for every dummy column in
+    ``feature_columns``; values without a training column simply encode as all zeros.
+    """
+    mapping = []
+    for index, column in enumerate(feature_columns):
+        for feature in CATEGORICAL_FEATURES:
+            prefix = feature + "_"
+            if column.startswith(prefix):
+                mapping.append((index, feature, column[len(prefix):]))
+                break
+    return tuple(mapping)
+
+
+def _applicant_column(applicants_data, name, dtype):
+    """One raw field for every applicant, from a list of dicts or a DataFrame."""
+    if isinstance(applicants_data, pd.DataFrame):
+        column = applicants_data[name]
+        return (column.astype(str) if dtype is object else column).to_numpy(dtype=dtype)
+    if dtype is object:
+        return np.array([str(row[name]) for row in applicants_data], dtype=object)
+    return np.array([row[name] for row in applicants_data], dtype=dtype)
+
+
+def build_feature_matrix(applicants_data, feature_columns: list):
+    """
+    Builds the model feature matrix for a batch of applicants directly with NumPy.
+    ``applicants_data`` is a list of dicts or a DataFrame with the same column names.
+    Produces the same columns as ``preprocess_input`` without pandas.
+    """
+    feature_columns = tuple(feature_columns)
+    matrix = np.zeros((len(applicants_data), len(feature_columns)), dtype=np.float64)
+
+    # Numeric and derived features, one vectorized column at a time
+    columns = {name: _applicant_column(applicants_data, name, np.float64) for name in NUMERIC_FEATURES}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns = compute_features(columns)
+    for index, column in enumerate(feature_columns):
+        if column in columns:
+            matrix[:, index] = columns[column]
+
+    # One-hot encode categorical features with the fixed mapping
+    categories = {name: _applicant_column(applicants_data, name, object) for name in CATEGORICAL_FEATURES}
+    for index, feature, value in _one_hot_mapping(feature_columns):
+        matrix[:, index] = categories[feature] == value
+
+    return matrix
+
+
+def predict_grant_categories(applicants_data: list, feature_columns: list):
+    """
+    Predicts grant categories for a batch of applicants with a single forest pass.
+    Returns one result per applicant, in the same format as ``predict_grant_category``.
+    """
+    if not applicants_data:
+        return []
+
+    with timed("grant_batch_preprocess"):
+        features = build_feature_matrix(applicants_data, feature_columns)
+
+    with timed("grant_batch_predict_proba"):
+        predicted_categories, predicted_probabilities = score_grant_features(features, feature_columns)
+
+    return [
+        {
+            "predicted_category": int(category),
+            "probabilities": probabilities.tolist(),
+            "grant_message": GRANT_MESSAGES.get(int(category), "Error: Invalid category predicted.")
+        }
+        for category, probabilities in zip(predicted_categories, predicted_probabilities)
+    ]
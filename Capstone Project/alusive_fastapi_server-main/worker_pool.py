@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import Histogram, collector
+
+
+class PoolSaturated(Exception):
+    """Raised when a pool has no free worker and its queue is full."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"The '{name}' pool is saturated.")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn, submitted_at, args, kwargs):
+    """Runs ``fn`` inside the worker and reports how long it queued and ran."""
+    started_at = time.time()  # Wall clock, so it is comparable across processes
+    try:
+        value, ok = fn(*args, **kwargs), True
+    except Exception as e:
+        value, ok = e, False
+    return ok, value, started_at - submitted_at, time.time() - started_at
+
+
+class BoundedPool:
+    """
+    Thread or process pool with a concurrency limit and a queue-depth limit.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more
+    wait for a worker; anything beyond that is rejected with ``PoolSaturated``
+    instead of piling up latency.
+
+    The executor is created on first use in each process. A pool built before a
+    fork (e.g. in a preloading gunicorn master) must not hand its threads, or its
+    process pool's call and result pipes, to the forked workers.
+    """
+
+    def __init__(self, name, max_workers=2, max_queue=8, kind="thread", retry_after=5):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind '{kind}'. Must be 'thread' or 'process'.")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+        self.queue_wait = Histogram()
+        self.execution_time = Histogram()
+        collector.attach_histogram("pool_queue_wait_seconds", self.queue_wait, "Time calls wait for a pool worker.", pool=name)
+        collector.attach_histogram("pool_execution_seconds", self.execution_time, "Time calls run in a pool worker.", pool=name)
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules ``fn`` and returns a future for its result, or raises ``PoolSaturated``."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturated(self.name, self.retry_after)
+            self._pending += 1
+
+        result = Future()
+        try:
+            inner = self._ensure_executor().submit(_timed_call, fn, time.time(), args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        inner.add_done_callback(lambda done: self._finish(done, result))
+        return result
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaitable ``submit`` for use from async endpoints."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _finish(self, inner, result):
+        with self._lock:
+            self._pending -= 1
+
+        try:
+            ok, value, waited, elapsed = inner.result()
+        except Exception as e:  # Worker crashed or the outcome could not be unpickled
+            with self._lock:
+                self._failed += 1
+            result.set_exception(e)
+            return
+
+        self.queue_wait.observe(max(waited, 0.0))
+        self.execution_time.observe(elapsed)
+        with self._lock:
+            if ok:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+        if ok:
+            result.set_result(value)
+        else:
+            result.set_exception(value)
+
+    def stats(self):
+        """Returns pool occupancy, counters and latency histograms."""
+        with self._lock:
+            pending = self._pending
+            completed, failed, rejected = self._completed, self._failed, self._rejected
+
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(pending, self.max_workers),
+            "queued": max(pending - self.max_workers, 0),
+            "completed": completed,
+            "failed": failed,
+            "rejected": rejected,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "execution_seconds": self.execution_time.snapshot(),
+        }
+
+    def shutdown(self, wait=True):
+        # Only this process's own executor; one inherited through a fork is not ours to stop
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)